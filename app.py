@@ -1,8 +1,12 @@
+from concurrent.futures import wait
+
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import numpy as np
-import plotly.express as px
+
+import server
+from export import FORMATS, formats
+from survey import DISTRICT, GENDER, QUESTIONS, SECTIONS, USAGE, is_free_text
+from text_index import tokenize
+from url_state import canonical, parse
 
 #Page Setup
 st.set_page_config(page_title='CFRM Research 2023',
@@ -10,1162 +14,242 @@ st.set_page_config(page_title='CFRM Research 2023',
                    layout='wide',
                    initial_sidebar_state="expanded")
 
-data_link = st.secrets['data_link']
+# Sidebar names of the filters
+FILTER_LABELS = {GENDER: "Gender", USAGE: "Type of usage of CFRM", DISTRICT: "District"}
 
 #Data fetch
-@st.cache_data
-def load_data():
-    df = pd.read_csv(data_link, sep=';')    
-    return df
-df = load_data()
+# The data source lives in server.py, once per process: it keeps serving the
+# snapshot already in memory and swaps in a new one only after a changed export
+# has been fully parsed (or a newer bundle mapped).
+snapshot = server.current_snapshot()
+data = snapshot.data
+
+#Shared links
+# The sidebar starts from the state in the URL (read once per session) and the
+# URL follows the sidebar, so the address bar always links to this view.
+if 'url_state' not in st.session_state:
+    st.session_state.url_state = parse(data, st.experimental_get_query_params())
+initial_selection, initial_query, initial_compare, initial_weighted = st.session_state.url_state
+
+#Weighting
+# With a weights file in the secrets (weights_path), every chart, percentage
+# and download can count each submission with its weight. The weighted copy of
+# the snapshot has its own version, so it is cached apart from the unweighted.
+weighted = False
+if server.weights_available():
+    weighted = st.sidebar.toggle("Weighted estimates", value=initial_weighted,
+                                 help="Scale the submissions to the population of their district, gender and age band.")
+    if weighted:
+        try:
+            snapshot = server.weighted_snapshot(snapshot)
+        except (OSError, ValueError) as error:
+            st.sidebar.error(f"The weights could not be loaded: {error}")
+            weighted = False
+        data = snapshot.data
 
 # Display number of submissions
-st.sidebar.markdown(f"**Total Submissions: {len(df)}**")
+st.sidebar.markdown(f"**Total Submissions: {len(data)}**")
+if weighted:
+    st.sidebar.caption(f"Weighted to {data.cell_sizes().sum():,.0f} beneficiaries")
 
 st.title("CFRM Research: Data Analysis")
+
+#Browser-side filtering
+# The count cubes are sent once; filters and charts are then recomputed in the
+# browser and changing a filter does not rerun this script.
+if st.sidebar.toggle("Filter in the browser (no page reloads)"):
+    from cube_view import cube_view  # Only sessions using the mode load the component
+
+    cube_view(server.browser_payload(snapshot), SECTIONS, labels=FILTER_LABELS, key='cube_view')
+    st.stop()
+
 st.sidebar.subheader("Please filter the data:")
 
 #FILTERS
 gender_filter = st.sidebar.multiselect(
     "Please select Gender",
-    options=df['Gender of the person interviewed'].unique(),
-    default=df['Gender of the person interviewed'].unique()
+    options=data.options(GENDER),
+    default=initial_selection[GENDER]
 )
 usage_filter = st.sidebar.multiselect(
     "Please select type of usage of CFRM",
-    options=df["How often have you interacted INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?"].unique(),
-    default=df["How often have you interacted INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?"].unique()
+    options=data.options(USAGE),
+    default=initial_selection[USAGE]
 )
 
 district_filter = st.sidebar.multiselect(
     "Please select district",
-    options=df['District'].unique(),
-    default=df['District'].unique()
-)
-
-#Filter query
-df_query = "`Gender of the person interviewed` == @gender_filter & `How often have you interacted INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?` == @usage_filter& `District` ==  @district_filter"
-df = df.query(df_query)
-
+    options=data.options(DISTRICT),
+    default=initial_selection[DISTRICT]
+)
+
+#Filter selection
+# Charts sum the pre-aggregated counts of the selected cells instead of
+# filtering the rows on every rerun.
+selection = {GENDER: gender_filter, USAGE: usage_filter, DISTRICT: district_filter}
+
+#Search
+# Free text answers are looked up in an inverted index built at load time;
+# every chart highlights the answers of the matching submissions.
+query = st.sidebar.text_input("Search free text answers", value=initial_query, placeholder="e.g. hotline evening")
+
+#Comparison
+# Segments are values of one filter, shown side by side on every chart; each
+# chart gets all of them from one pass over its count cube.
+NO_COMPARISON = "(none)"
+compare_labels = [NO_COMPARISON] + list(FILTER_LABELS.values())
+compare_by = st.sidebar.selectbox(
+    "Compare segments by", compare_labels,
+    index=compare_labels.index(FILTER_LABELS[initial_compare[0]]) if initial_compare else 0
+)
+compare = None
+if compare_by != NO_COMPARISON:
+    compare_name = {label: name for name, label in FILTER_LABELS.items()}[compare_by]
+    compare_options = data.options(compare_name)
+    default_segments = (initial_compare[1] if initial_compare and initial_compare[0] == compare_name
+                        else compare_options[:2])
+    segments = st.sidebar.multiselect("Segments", options=compare_options, default=default_segments)
+    compare = (compare_name, segments)
+
+url_params = st.experimental_get_query_params()
+params = canonical(data, selection, query, compare, weighted)
+debug = 'debug' in url_params
+if debug:
+    params['debug'] = url_params['debug']
+if params != url_params:
+    st.experimental_set_query_params(**params)
+st.sidebar.caption("Share this view by copying the page address.")
+
+#Downloads
+# Generated on request from the selected rows, a chunk at a time, and cached
+# per selection: the next download of the same selection is instant.
+with st.sidebar.expander("Download data"):
+    export_format = st.selectbox("Format", [fmt.upper() for fmt in formats()]).lower()
+    mime, extension = FORMATS[export_format]
+    for kind, label in (('aggregates', "chart tables"), ('rows', "respondent rows")):
+        body = server.cached_export(snapshot, selection, kind, export_format)
+        if body is None and st.button(f"Prepare {label}", key=f"prepare_{kind}"):
+            with st.spinner(f"Preparing {label}..."):
+                body = server.export(snapshot, selection, kind, export_format)
+        if body is not None:
+            st.download_button(f"Download {label}", body, file_name=f"cfrm_{kind}.{extension}",
+                               mime=mime, key=f"download_{kind}")
+
+#Debug
+# Open the page with ?debug=1 to see the memory budget, cache counters and
+# the answers the declared vocabularies miss
+if debug:
+    with st.sidebar.expander("Debug: caches", expanded=True):
+        governor = server.GOVERNOR
+        st.caption(f"{governor.bytes / 2 ** 20:.1f} of {governor.budget / 2 ** 20:.0f} MB in use, "
+                   f"{governor.evictions} evictions by the budget")
+        st.dataframe(governor.report(), use_container_width=True, hide_index=True)
+        disk = server.get_disk_cache()
+        if disk is not None:
+            st.caption(f"Disk cache: {disk.stats()}")
+    # Checked when the version was loaded; answers the declared option lists
+    # and label maps of survey.py miss are left out of the charts
+    vocabulary = server.vocabulary_report(server.current_snapshot())
+    with st.sidebar.expander("Admin: answer vocabulary", expanded=bool(vocabulary['rows'].any())):
+        if vocabulary.empty:
+            st.caption("Every answer matches the declared options.")
+        else:
+            st.caption("Answers outside the declared options of survey.py: unknown ones are not charted, "
+                       "renamed ones likely are a declared option reworded.")
+            st.dataframe(vocabulary, use_container_width=True, hide_index=True)
+
+#Low-bandwidth mode
+# Charts are sent as server-rendered SVG; the plotly bundle (1 MB gzipped) is
+# only loaded for the charts switched to their interactive version. A page of
+# SVG costs more than one of figure JSON, so the mode pays off for short
+# visits on a cold browser cache (benchmarks/payload.py).
+images_available = server.images_available()
+low_bandwidth = st.sidebar.toggle(
+    "Low-bandwidth mode (static images)",
+    disabled=not images_available,
+    help=("Skips the 1 MB chart library download; best for a few page views on a slow connection."
+          if images_available else "Install kaleido to render charts on the server.")
+)
+
+if tokenize(query):
+    matches = server.search(snapshot, selection, query)
+    terms = tokenize(query)
+
+    def mark(value):
+        words = tokenize(value) if isinstance(value, str) else []
+        found = any(word.startswith(term) for word in words for term in terms)
+        return 'background-color: rgba(255, 215, 0, 0.35)' if found else ''
+
+    with st.expander(f"{len(matches)} submissions mention \"{query}\" (highlighted in gold on the charts)",
+                     expanded=True):
+        # Only the first rows are materialized; the explorer below pages through answers
+        columns = [name for name in data.columns if name in data.categories and is_free_text(name)]
+        shown = data.frame(matches[:100], columns=list(selection) + columns)
+        st.dataframe(shown.style.applymap(mark, subset=columns), use_container_width=True)
 
 # Charts Section
-st.subheader('Gender & Age Disaggregation')
-# -- Pie Chart - Gender
-
-# Calculate the counts for each age group
-gender_counts = df['Gender of the person interviewed'].value_counts()
-
-# Create the pie chart with a blue color scheme
-fig_gender = px.pie(
-    gender_counts,
-    values=gender_counts.values,
-    names=gender_counts.index,
-    title='Gender Disaggregation',
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Set the color scheme to blue
-)
-
-# Customize layout for clarity and visibility
-fig_gender.update_traces(
-    textinfo='percent+label',
-    marker=dict(line=dict(color='#000000', width=2))  # Adds a line around each segment
-)
-
-# Set transparent background
-fig_gender.update_layout(
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)',
-    showlegend=True
-)
-st.plotly_chart(fig_gender, use_container_width=True)
-
-# --- end of pie chart gender
-
-# -- Pie Chart - Age
-
-conditions = [
-    (df['Age of the person interviewed'] <= 17),
-    ((df['Age of the person interviewed'] > 17) & (df['Age of the person interviewed'] <= 59)),
-    (df['Age of the person interviewed'] > 59)
-]
-
-labels = ['0-17 years', '18-59 years', '59+ years']
-
-df['AgeGroup'] = np.select(conditions, labels, default='Unknown')
-
-
-# Calculate the counts for each age group
-age_group_counts = df['AgeGroup'].value_counts()
-
-# Create the pie chart with a blue color scheme
-fig_age = px.pie(
-    age_group_counts,
-    values=age_group_counts.values,
-    names=age_group_counts.index,
-    title='Age Disaggregation',
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Set the color scheme to blue
-)
-
-# Customize layout for clarity and visibility
-fig_age.update_traces(
-    textinfo='percent+label',
-    marker=dict(line=dict(color='#000000', width=2))  # Adds a line around each segment
-)
-
-# Set transparent background
-fig_age.update_layout(
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)',
-    showlegend=True
-)
-
-st.plotly_chart(fig_age, use_container_width=True)
-
-# --- end age pie chart
-st.markdown('---')
-
-# -- Bar Chart - Impairments
-
-potential_answers = [
-    "Difficulty seeing, even if wearing glasses",
-    "Difficulty hearing, even if using a hearing aid",
-    "Difficulty walking or climbing steps",
-    "Difficulty remembering or concentrating",
-    "None of the above"
-]
-pwd = df['If you encounter any difficulties from this list, please select which']
-pwd_counts = {answer: pwd.str.count(answer).sum() for answer in potential_answers}
-
-df_pwd = pd.DataFrame(list(pwd_counts.items()), columns=['Answer', 'Count'])
-
-# Sort data for better visualization
-df_pwd_sorted = df_pwd.sort_values('Count', ascending=False)
-
-
-# Create the bar chart with simplified x-axis
-fig_pwd = px.bar(
-    df_pwd_sorted,
-    x='Answer',
-    y='Count',
-    text_auto=True,  # Automatically add text on bars
-    title='Type of Impairments',
-    color='Answer',  # Color by answer
-    color_continuous_scale='blues'  # Use a blue color scale
-)
-
-# Customize the chart layout
-fig_pwd.update_layout(
-    xaxis_title="",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=True  # Ensure the legend is shown
-)
-
-# Customize x-axis to remove the labels
-fig_pwd.update_xaxes(showticklabels=False)  # Hide x-axis labels
-
-# Customize bar appearance
-fig_pwd.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8  # Adjust for slight transparency
-)
-st.plotly_chart(fig_pwd, use_container_width=True)
-
-# --- end bar chart impairments
-
-st.markdown('---')
-
-# -- Pie Chart Usage of CFRM
-
-usage_counts = df["How often have you interacted INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?"].value_counts()
-
-# Create the pie chart
-fig_usage = px.pie(
-    usage_counts,
-    values=usage_counts.values,
-    names=usage_counts.index,
-    title='CFRM Usage (How often you used CFRM?)',
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Optional: for a nice color sequence
-)
-
-# Customize layout for clarity and visibility
-fig_usage.update_traces(
-    textinfo='percent+label',
-    marker=dict(line=dict(color='#000000', width=2)),  # Optional: adds a line around each segment
-    pull=[0.1 if usage_counts[i] == usage_counts.max() else 0 for i in range(len(usage_counts))]  # Optional: pulls the largest segment slightly out
-)
-
-# Set transparent background
-fig_usage.update_layout(
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)',
-    showlegend=True
-)
-
-# Show the fig_usageure
-st.plotly_chart(fig_usage, use_container_width=True)
-
-# --- end of the chart 
-
-st.markdown('---')
-st.subheader('Insights on CFRM Awareness')
-# -- Pie Chart Informed Status
-
-# Replace long sentences with shorter labels
-df["Are you informed about INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?"].replace({
-    'Yes, I am informed about the CFRM.': 'Informed',
-    "I heard about it but don't know the details.": 'Partially Informed',
-    'No, I am not aware of the CFRM.': 'Not aware'
-}, inplace=True)
-
-# Calculate the counts for CFRM awareness
-cfrm_awareness_counts = df["Are you informed about INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?"].value_counts()
-
-# Create the pie chart with an appropriate color scheme
-fig_cfrm_awareness = px.pie(
-    cfrm_awareness_counts,
-    values=cfrm_awareness_counts.values,
-    names=cfrm_awareness_counts.index,
-    title='CFRM Awareness Disaggregation',
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Reversed Red-Blue color scheme
-)
-
-# Customize layout for clarity and visibility
-fig_cfrm_awareness.update_traces(
-    textinfo='percent+label',
-    marker=dict(line=dict(color='#000000', width=2))  # Adds a line around each segment
-)
-
-# Set transparent background
-fig_cfrm_awareness.update_layout(
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)',
-    showlegend=True
-)
-
-st.plotly_chart(fig_cfrm_awareness, use_container_width=True)
-
-#--- chart ends
-
-# -- Bar Chart Info
-
-potential_answers = [
-    "Poster/Leaflet;",
-    "Capacity Building Activities;",
-    "Social Media;",
-    "Directly from INTERSOS staff;",
-    "Word of mouth;",
-    "Other;"
-]
-info_sharing = df["How did you learn about INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?"]
-info_sharing_counts = {answer: info_sharing.str.count(answer).sum() for answer in potential_answers}
-
-df_info_sharing = pd.DataFrame(list(info_sharing_counts.items()), columns=['Answer', 'Count'])
-
-# Sort data for better visualization
-df_info_sharing_sorted = df_info_sharing.sort_values('Count', ascending=False)
-
-# Create the bar chart with a consistent color scheme
-fig_info = px.bar(
-    df_info_sharing_sorted,
-    x='Answer',
-    y='Count',
-    text_auto=True,  # Automatically add text on bars
-    title='Ways People Learned About CFRM',
-    color='Answer',  # Color by answer
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Use a blue color scale consistent with other charts
-)
-
-# Customize the chart layout
-fig_info.update_layout(
-    xaxis_title="Information Source",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=False  # Hide the legend if not necessary
-)
-
-# Customize bar appearance
-fig_info.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8,
-    textangle=0  # Set text angle to 0 for horizontal alignment  # Adjust for slight transparency
-)
-
-st.plotly_chart(fig_info, use_container_width=True)
-
-# --- chart ends 
-
-# -- Bar Chart Prefered Info Sharin 
-
-potential_answers = [
-    "Poster/Leaflet;",
-    "Capacity Building Activities;",
-    "Social Media;",
-    "Directly from INTERSOS staff;",
-    "Word of mouth;",
-    "Email",
-    "Phone",
-    "Other;"
-]
-info_sharing = df["How would you prefer to receive information about INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?"]
-info_sharing_counts = {answer: info_sharing.str.count(answer).sum() for answer in potential_answers}
-
-df_info_sharing = pd.DataFrame(list(info_sharing_counts.items()), columns=['Answer', 'Count'])
-df_info_sharing_sorted = df_info_sharing.sort_values('Count', ascending=False)
-
-# Create the bar chart with a consistent color scheme
-fig_preferred_info = px.bar(
-    df_info_sharing_sorted,
-    x='Answer',
-    y='Count',
-    text_auto=True,  # Automatically add text on bars
-    title='Preferred Ways to Learn About CFRM',
-    color='Answer',  # Color by answer
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Use a blue color scale consistent with other charts
-)
-
-# Customize the chart layout
-fig_preferred_info.update_layout(
-    xaxis_title="Preferred Information Source",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=False  # Hide the legend if not necessary
-)
-
-# Customize bar appearance
-fig_preferred_info.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8,
-    textangle = 0  # Adjust for slight transparency
-)
-
-st.plotly_chart(fig_preferred_info, use_container_width=True)
-# --- ends chart
-
-st.markdown('---')
-
-# -- Bar Chart complaint choice
-
-df['Would you try to solve your problem on your own before submitting a complaint?'].replace({
-    'Yes, definitely': 'Definitely',
-    "I'd consider it": 'Consider',
-    'Possibly, depending on the issue': 'Possibly',
-    'Unlikely, but not ruled out': 'Unlikely',
-    "No, I'd go straight to a complaint": 'Straight to Complaint'
-}, inplace=True)
-
-response_counts = df['Would you try to solve your problem on your own before submitting a complaint?'].value_counts()
-
-# Assuming response_counts is a Series with the count of each response
-categories = ['Straight to Complaint', 'Unlikely', 'Possibly', 'Consider', 'Definitely']
-counts = [response_counts.get(category, 0) for category in categories]
-
-# Define a gradient color scale from bright blue to red
-color_scale = ['blue', 'lightblue', 'lightcoral', 'coral', 'red']
-
-# Create the diverging bar chart
-fig_complaint_choice = go.Figure()
-
-# Adding bars for each response category
-for i, category in enumerate(categories):
-    fig_complaint_choice.add_trace(go.Bar(
-        x=[category],
-        y=[counts[i]],
-        name=category,
-        marker_color=color_scale[i],
-        marker_line_color='rgb(8,48,107)',
-        marker_line_width=1.5,
-        opacity=0.8
-    ))
-
-# Customize the layout
-fig_complaint_choice.update_layout(
-    title='Q: Would you try to solve your problem on your own before submitting a complaint?',
-    xaxis=dict(title='Response Categories'),
-    yaxis=dict(title='Count of Responses'),
-    plot_bgcolor='rgba(0,0,0,0)',
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),
-    barmode='relative',
-    showlegend=False
-)
-
-st.plotly_chart(fig_complaint_choice, use_container_width= True)
-
-# --- end of the chart
-st.markdown('---')
-st.subheader('Likelihood of complaint submision')
-
-# Calculate the counts for each age group
-non_sensitive_comp = df['How likely are you to submit a non-sensitive complaint?'].value_counts()
-
-# Create the bar chart with a consistent color scheme
-fig_nonsens = px.bar(
-    non_sensitive_comp,
-    x=non_sensitive_comp.index,
-    y=non_sensitive_comp.values,
-    text_auto=True,  # Automatically add text on bars
-    title='How Likely Are You to Submit a Non-Sensitive Complaint?',
-    color = non_sensitive_comp.index,
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Use a blue color scale consistent with other charts
-)
-
-# Customize the chart layout
-fig_nonsens.update_layout(
-    xaxis_title="Response",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=False  # Hide the legend if not necessary
-)
-
-# Customize bar appearance
-fig_nonsens.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8  # Adjust for slight transparency
-)
-
-# Show the figure
-st.plotly_chart(fig_nonsens, use_container_width=True)
-
-# --- chart ends 
-
-# -- Bar Chart sens comp
-
-# Calculate the counts for each age group
-non_sensitive_comp = df['How likely are you to submit a sensitive complaint?'].value_counts()
-
-# Create the bar chart with a consistent color scheme
-fig_sens_comp = px.bar(
-    non_sensitive_comp,
-    x=non_sensitive_comp.index,
-    y=non_sensitive_comp.values,
-    text_auto=True,  # Automatically add text on bars
-    title='How Likely Are You to Submit a Sensitive Complaint?',
-    color = non_sensitive_comp.index,
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Use a blue color scale consistent with other charts
-)
-
-# Customize the chart layout
-fig_sens_comp.update_layout(
-    xaxis_title="Response",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=False  # Hide the legend if not necessary
-)
-
-# Customize bar appearance
-fig_sens_comp.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8  # Adjust for slight transparency
-)
-
-st.plotly_chart(fig_sens_comp, use_container_width=True)
-
-# -- Bar Chart Concerns 
-
-potential_answers = [
-    "Transparency;",
-    "Timeliness of responses;",
-    "Lack of accessibility;",
-    "Data security;",
-    "Language barriers;"
-]
-
-concerns_cfrm = df["What concerns do you have about INTERSOS' Complaint, Feedback and Response Mechanisms(CFRM)?"]
-conncerns_counts = {answer: concerns_cfrm.str.count(answer).sum() for answer in potential_answers}
-
-df_concerns = pd.DataFrame(list(conncerns_counts.items()), columns=['Answer', 'Count'])
-df_concerns_sorted = df_concerns.sort_values('Count', ascending=False)
-
-# Create the bar chart with a consistent color scheme
-fig_concerns = px.bar(
-    df_concerns_sorted,
-    x='Answer',
-    y='Count',
-    text_auto=True,  # Automatically add text on bars
-    title='Preferred Ways to Learn About CFRM',
-    color='Answer',  # Color by answer
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Use a blue color scale consistent with other charts
-)
-
-# Customize the chart layout
-fig_concerns.update_layout(
-    xaxis_title="Beneficiary Concerns about CFRM",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=False  # Hide the legend if not necessary
-)
-
-# Customize bar appearance
-fig_concerns.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8  # Adjust for slight transparency
-)
-
-st.plotly_chart(fig_concerns, use_container_width=True)
-
-# --- end 
-st.markdown('---')
-
-# -- Bar Chart Submiting Option 
-
-submit_option = df["How did you submit your complaint/feedback?"].value_counts()
-
-fig_so = px.bar(submit_option, 
-                x=submit_option.index,
-                y=submit_option.values,
-                text_auto=True,  # Automatically add text on bars
-                title='How did you submit your complaint/feedback?',
-                color = submit_option.index,
-                 color_discrete_sequence=px.colors.sequential.RdBu_r  # Use a blue color scale consistent with other charts
-                 )
-# Customize the chart layout
-fig_so.update_layout(
-    xaxis_title="Response",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=False  # Hide the legend if not necessary
-)
-
-# Customize bar appearance
-fig_so.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8,
-    textangle = 0
-)
-st.plotly_chart(fig_so,use_container_width=True)
-
-# --- end of the chart 
-
-# -- Bar Chart Type of submision 
-
-submit_type = df["What type of submission you made?"].value_counts()
-
-fig_st = px.bar(submit_type, 
-                x=submit_type.index,
-                y=submit_type.values,
-                text_auto=True,  # Automatically add text on bars
-                title='What type of submission you made?',
-                color = submit_type.index,
-                 color_discrete_sequence=px.colors.sequential.RdBu_r  # Use a blue color scale consistent with other charts
-                 )
-# Customize the chart layout
-fig_st.update_layout(
-    xaxis_title="Response",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=False  # Hide the legend if not necessary
-)
-
-# Customize bar appearance
-fig_st.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8,
-    textangle = 0
-)
-
-st.plotly_chart(fig_st, use_container_width=True)
-
-# --- end of the chart 
-st.markdown('---')
-# -- Pie Chart 
-
-# Calculate the counts for each age group
-followup_count = df['Did anyone from INTERSOS reached out to you after your complaint/feedback?'].value_counts()
-
-# Create the pie chart with a blue color scheme
-fig_flup = px.pie(
-    followup_count,
-    values=followup_count.values,
-    names=followup_count.index,
-    title='Did anyone from INTERSOS reached out to you after your complaint/feedback?',
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Set the color scheme to blue
-)
-
-# Customize layout for clarity and visibility
-fig_flup.update_traces(
-    textinfo='percent+label',
-    marker=dict(line=dict(color='#000000', width=2))  # Adds a line around each segment
-)
-
-# Set transparent background
-fig_flup.update_layout(
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)',
-    showlegend=True
-)
-
-st.plotly_chart(fig_flup, use_container_width= True)
-
-# --- end of the chart 
-st.markdown('---')
-# -- Bar Chart L1
-
-# Sort the DataFrame in the desired order
-desired_order = ['Very Good', 'Good', 'Neutral', 'Bad', 'Very Bad']
-lq_submitting_sorted = df["How would you rate the experience of submitting a complaint/feedback?"].value_counts().reindex(desired_order)
-
-# Define the custom color sequence
-custom_colors = ['blue', 'lightblue', 'gray', 'lightcoral', 'red']
-
-# Create the bar chart
-fig_st = px.bar(
-    lq_submitting_sorted,
-    x=lq_submitting_sorted.index,
-    y=lq_submitting_sorted.values,
-    text_auto=True,
-    title='Experience Rating of Submitting a Complaint/Feedback',
-    color=lq_submitting_sorted.index,
-    color_discrete_sequence=custom_colors
-)
-
-# Customize the chart layout
-fig_st.update_layout(
-    xaxis_title="Response",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),
-    showlegend=False
-)
-
-# Customize bar appearance
-fig_st.update_traces(
-    marker_line_color='rgb(8,48,107)',
-    marker_line_width=1.5,
-    opacity=0.8,
-    textangle=0
-)
-
-st.plotly_chart(fig_st, use_container_width=True)
-
-# ----
-
-# Sort the DataFrame in the desired order
-desired_order = ['Very Good', 'Good', 'Neutral', 'Bad', 'Very Bad']
-lq_submitting_sorted2 = df["How would you rate the speed of INTERSOS reaching to you after your complaint/feedback?"].value_counts().reindex(desired_order)
-
-# Define the custom color sequence
-custom_colors = ['blue', 'lightblue', 'gray', 'lightcoral', 'red']
-
-# Create the bar chart
-fig_st2 = px.bar(
-    lq_submitting_sorted2,
-    x=lq_submitting_sorted2.index,
-    y=lq_submitting_sorted2.values,
-    text_auto=True,
-    title='Experience Rating of Receiving Follow Up',
-    color=lq_submitting_sorted2.index,
-    color_discrete_sequence=custom_colors
-)
-
-# Customize the chart layout
-fig_st2.update_layout(
-    xaxis_title="Response",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),
-    showlegend=False
-)
-
-# Customize bar appearance
-fig_st2.update_traces(
-    marker_line_color='rgb(8,48,107)',
-    marker_line_width=1.5,
-    opacity=0.8,
-    textangle=0
-)
-
-st.plotly_chart(fig_st2,use_container_width=True)
-
-# Sort the DataFrame in the desired order
-desired_order = ['Very Good', 'Good', 'Neutral', 'Bad', 'Very Bad']
-lq_submitting_sorted3 = df["How would you rate the experience of receiving updates on your case?"].value_counts().reindex(desired_order)
-
-# Define the custom color sequence
-custom_colors = ['blue', 'lightblue', 'gray', 'lightcoral', 'red']
-
-# Create the bar chart
-fig_st3 = px.bar(
-    lq_submitting_sorted3,
-    x=lq_submitting_sorted3.index,
-    y=lq_submitting_sorted3.values,
-    text_auto=True,
-    title='Experience Rating of receiving updates',
-    color=lq_submitting_sorted3.index,
-    color_discrete_sequence=custom_colors
-)
-
-# Customize the chart layout
-fig_st3.update_layout(
-    xaxis_title="Response",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),
-    showlegend=False
-)
-
-# Customize bar appearance
-fig_st3.update_traces(
-    marker_line_color='rgb(8,48,107)',
-    marker_line_width=1.5,
-    opacity=0.8,
-    textangle=0
-)
-
-st.plotly_chart(fig_st3, use_container_width=True)
-
-# Sort the DataFrame in the desired order
-desired_order = ['Very Good', 'Good', 'Neutral', 'Bad', 'Very Bad']
-lq_submitting_sorted4= df["How would you rate INTERSOS' attempt to implement your complaint/feedback?"].value_counts().reindex(desired_order)
-
-# Define the custom color sequence
-custom_colors = ['blue', 'lightblue', 'gray', 'lightcoral', 'red']
-
-# Create the bar chart
-fig_st4 = px.bar(
-    lq_submitting_sorted4,
-    x=lq_submitting_sorted4.index,
-    y=lq_submitting_sorted4.values,
-    text_auto=True,
-    title='Experience Rating of implementation of complaint/feedback',
-    color=lq_submitting_sorted4.index,
-    color_discrete_sequence=custom_colors
-)
-
-# Customize the chart layout
-fig_st4.update_layout(
-    xaxis_title="Response",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),
-    showlegend=False
-)
-
-# Customize bar appearance
-fig_st4.update_traces(
-    marker_line_color='rgb(8,48,107)',
-    marker_line_width=1.5,
-    opacity=0.8,
-    textangle=0
-)
-
-st.plotly_chart(fig_st4, use_container_width=True)
-
-
-# ------ section ends 
-
-st.markdown('---')
-
-df['Did INTERSOS staff follow up with you to provide updates on the status of your case? Informing about updates, timelines, etc.'].replace({
-    'Yes, I received regular and comprehensive updates regarding the status of my complaint.': 'Regular Updates',
-    'I received moderate communication and updates about my issue.': 'Moderate Communication',
-    'No follow-up or status updates were provided after the initial call.': 'No Follow-up',
-    "I haven't received an initial call.": 'No Initial Call'
-}, inplace=True)
-
-# Calculate the counts for each age group
-followup_aftercall = df['Did INTERSOS staff follow up with you to provide updates on the status of your case? Informing about updates, timelines, etc.'].value_counts()
-
-# Create the bar chart with a consistent color scheme
-fig_follow_up_aftercall = px.bar(
-    followup_aftercall,
-    x=followup_aftercall.index,
-    y=followup_aftercall.values,
-    text_auto=True,  # Automatically add text on bars
-    title='Received follow up updates',
-    color = followup_aftercall.index,
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Use a blue color scale consistent with other charts
-)
-
-# Customize the chart layout
-fig_follow_up_aftercall.update_layout(
-    xaxis_title="Response",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=False  # Hide the legend if not necessary
-)
-
-# Customize bar appearance
-fig_follow_up_aftercall.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8  # Adjust for slight transparency
-)
-
-st.plotly_chart(fig_follow_up_aftercall, use_container_width=True)
-
-# -- end chart 
-
-st.markdown('---')
-
-# --- Bar Chart Resolution 
-
-df['Do you think that the INTERSOS\' Complaint, Feedback and Response Mechanisms (CFRM) has had a positive impact on your complaint/feedback?'].replace({
-    'Yes, all my complaints/feedback were taken into account': 'All Addressed',
-    'Some of my complaints/feedback were taken into account': 'Some Addressed',
-    'No changes followed my complaint/feedback': 'No Changes'
-}, inplace=True)
-
-# Calculate the counts for each age group
-complaint_resolution = df['Do you think that the INTERSOS\' Complaint, Feedback and Response Mechanisms (CFRM) has had a positive impact on your complaint/feedback?'].value_counts()
-
-# Create the bar chart with a consistent color scheme
-fig_complaint_res = px.bar(
-    complaint_resolution,
-    x=complaint_resolution.index,
-    y=complaint_resolution.values,
-    text_auto=True,  # Automatically add text on bars
-    title='Complaint Resolution Chart',
-    color = complaint_resolution.index,
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Use a blue color scale consistent with other charts
-)
-
-# Customize the chart layout
-fig_complaint_res.update_layout(
-    xaxis_title="Response",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=False  # Hide the legend if not necessary
-)
-
-# Customize bar appearance
-fig_complaint_res.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8  # Adjust for slight transparency
-)
-
-st.plotly_chart(fig_complaint_res, use_container_width=True)
-
-# -- Chart 
-
-# Calculate the counts for each age group
-comp_res_opinion = df['Do you feel like INTERSOS did their best to implement your complaint/feedback?'].value_counts()
-
-# Create the pie chart with a blue color scheme
-fig_cr_opinion = px.pie(
-    comp_res_opinion,
-    values=comp_res_opinion.values,
-    names=comp_res_opinion.index,
-    title='Do you feel like INTERSOS did their best to implement your complaint/feedback?',
-    color_discrete_sequence=px.colors.sequential.RdBu_r  # Set the color scheme to blue
-)
-
-# Customize layout for clarity and visibility
-fig_cr_opinion.update_traces(
-    textinfo='percent+label',
-    marker=dict(line=dict(color='#000000', width=2))  # Adds a line around each segment
-)
-
-# Set transparent background
-fig_cr_opinion.update_layout(
-    paper_bgcolor='rgba(0,0,0,0)',
-    plot_bgcolor='rgba(0,0,0,0)',
-    showlegend=True
-)
-
-st.plotly_chart(fig_cr_opinion, use_container_width=True)
-
-
+# Figures are built by charts.py and shared between sessions (server.py). In
+# the approximate mode a slow view first shows estimates while the exact
+# figures are computed in the background (see the end of the page).
+comparing = compare is not None and len(compare[1]) >= 2
+if comparing:
+    compare_name, segments = compare
+    figures, pending = server.comparison_figures(snapshot, selection, compare_name, segments, compare_by), None
+    st.info(f"Comparing {len(segments)} segments by {compare_by.lower()} (the sidebar filter on it does not apply). "
+            f"Bars are the share of each segment's respondents; Δ marks differences of 10 points or more.")
+else:
+    if compare is not None:
+        st.sidebar.caption("Pick two or more segments to compare.")
+    figures, pending = server.quick_figures(snapshot, selection, query)
+if pending is not None:
+    st.info("Approximate charts: estimated from a stratified sample, with 95% error bounds. "
+            "They are replaced by the exact counts as soon as these are ready.")
+
+def chart(key):
+    if low_bandwidth and not comparing and not st.checkbox("Interactive chart", key=f"interactive_{key}"):
+        st.image(server.image(snapshot, selection, key, query=query), use_column_width=True)
+    else:
+        st.plotly_chart(figures[key], use_container_width=True)
+
+for n, (subheader, keys) in enumerate(SECTIONS):
+    if n:
+        st.markdown('---')
+    if subheader:
+        st.subheader(subheader)
+    for key in keys:
+        chart(key)
+
+#Respondent explorer
+# The submissions behind one answer of a chart. Rows are filtered and sorted as
+# row numbers on the server; only the page on screen is materialized.
 st.markdown('---')
-
-# -- Communication Sequence 
-
-contact_methods = [
-    "Email;",
-    "Online form;",
-    "Feedback box;",
-    "Hotline;",
-    "In person;",
-    "Viber;",
-    "Telegram;",
-    "Whatsapp;",
-    "Facebook/Messengers;",
-    "Other;"
-]
-
-contact_methods_c = df['What would be the preferred channel of communication for a non-sensitive matter?']
-contact_methods_counts = {answer: contact_methods_c.str.count(answer).sum() for answer in contact_methods}
-
-df_com_nonsens = pd.DataFrame(list(contact_methods_counts.items()), columns=['Answer', 'Count'])
-
-# Sort data for better visualization
-df_com_nonsens_sorted = df_com_nonsens.sort_values('Count', ascending=False)
-
-
-# Create the bar chart with simplified x-axis
-fig_com_nonsens = px.bar(
-    df_com_nonsens_sorted,
-    x='Answer',
-    y='Count',
-    text_auto=True,  # Automatically add text on bars
-    title='Prefered Communication Channels (Non-sensetive)',
-    color='Answer',  # Color by answer
-    color_continuous_scale='blues'  # Use a blue color scale
-)
-
-# Customize the chart layout
-fig_com_nonsens.update_layout(
-    xaxis_title="",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=True  # Ensure the legend is shown
-)
-
-# Customize x-axis to remove the labels
-fig_com_nonsens.update_xaxes(showticklabels=False)  # Hide x-axis labels
-
-# Customize bar appearance
-fig_com_nonsens.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8  # Adjust for slight transparency
-)
-
-st.plotly_chart(fig_com_nonsens, use_container_width=True)
-# -------
-contact_methods_c = df['What would be the preferred channel of communication for a sensitive matter?']
-contact_methods_counts = {answer: contact_methods_c.str.count(answer).sum() for answer in contact_methods}
-
-df_com_nonsens = pd.DataFrame(list(contact_methods_counts.items()), columns=['Answer', 'Count'])
-
-# Sort data for better visualization
-df_com_nonsens_sorted = df_com_nonsens.sort_values('Count', ascending=False)
-
-
-# Create the bar chart with simplified x-axis
-fig_com_sens = px.bar(
-    df_com_nonsens_sorted,
-    x='Answer',
-    y='Count',
-    text_auto=True,  # Automatically add text on bars
-    title='Prefered Communication Channels (Sensetive)',
-    color='Answer',  # Color by answer
-    color_continuous_scale='blues'  # Use a blue color scale
-)
-
-# Customize the chart layout
-fig_com_sens.update_layout(
-    xaxis_title="",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=True  # Ensure the legend is shown
-)
-
-# Customize x-axis to remove the labels
-fig_com_sens.update_xaxes(showticklabels=False)  # Hide x-axis labels
-
-# Customize bar appearance
-fig_com_sens.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8,
-    textangle = 0
-)
-
-# Show the figure
-st.plotly_chart(fig_com_sens, use_container_width=True)
-
-st.markdown('---')
-
-# --- Feedback charts
-
-
-improvements1 = [
-    "Improved communication channels;",
-    "Better placement of the CFRM box;",
-    "Faster response times;",
-    "Improved transparency;",
-    "Improved communication about the case;",
-    "Other;"
-]
-
-
-improvements1_c = df['What are the areas you would like to see improved in the INTERSOS\' Complaint, Feedback and Response Mechanisms(CFRM)?']
-improvements1_counts = {answer: improvements1_c.str.count(answer).sum() for answer in improvements1}
-
-df_improve_cfrm = pd.DataFrame(list(improvements1_counts.items()), columns=['Answer', 'Count'])
-
-# Sort data for better visualization
-df_improve_cfrm_sorted = df_improve_cfrm.sort_values('Count', ascending=False)
-
-
-# Create the bar chart with simplified x-axis
-fig_improve_cfrm = px.bar(
-    df_improve_cfrm_sorted,
-    x='Answer',
-    y='Count',
-    text_auto=True,  # Automatically add text on bars
-    title='Key Aspects to Improve',
-    color='Answer',  # Color by answer
-    color_continuous_scale='blues'  # Use a blue color scale
-)
-
-# Customize the chart layout
-fig_improve_cfrm.update_layout(
-    xaxis_title="",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=True  # Ensure the legend is shown
-)
-
-# Customize x-axis to remove the labels
-fig_improve_cfrm.update_xaxes(showticklabels=False)  # Hide x-axis labels
-
-# Customize bar appearance
-fig_improve_cfrm.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8,
-    textangle = 0
-)
-
-# Show the figure
-st.plotly_chart(fig_improve_cfrm, use_container_width=True)
-
-
-improvements1 = [
-    "Privacy;",
-    "Safety;",
-    "Good communication channels;",
-    "Effectiveness;",
-    "Responsiveness;",
-    "Other;"
-]
-
-
-improvements1_c = df['What are the most important elements of complaint system that would encourage you to use it?']
-improvements1_counts = {answer: improvements1_c.str.count(answer).sum() for answer in improvements1}
-
-df_improve_cfrm = pd.DataFrame(list(improvements1_counts.items()), columns=['Answer', 'Count'])
-
-# Sort data for better visualization
-df_improve_cfrm_sorted = df_improve_cfrm.sort_values('Count', ascending=False)
-
-
-# Create the bar chart with simplified x-axis
-fig_improve_overall = px.bar(
-    df_improve_cfrm_sorted,
-    x='Answer',
-    y='Count',
-    text_auto=True,  # Automatically add text on bars
-    title='Key Aspects that encourage usage',
-    color='Answer',  # Color by answer
-    color_continuous_scale='blues'  # Use a blue color scale
-)
-
-# Customize the chart layout
-fig_improve_overall.update_layout(
-    xaxis_title="",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=True  # Ensure the legend is shown
-)
-
-# Customize x-axis to remove the labels
-fig_improve_overall.update_xaxes(showticklabels=False)  # Hide x-axis labels
-
-# Customize bar appearance
-fig_improve_overall.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8,
-    textangle = 0
-)
-
-# Show the figure
-st.plotly_chart(fig_improve_overall, use_container_width=True)
-
-feedback_categories  = [
-    "Suggestion of improvement of INTERSOS services;",
-    "Behavior of INTERSOS staff;",
-    "Information regarding INTERSOS' services;",
-    "Complaint about the quality of INTERSOS' services;",
-    "Safety concerns regarding the current accommodation;",
-    "Other;"
-]
-
-
-feedback_cat = df['If you had to make a complaint or suggestion, what topic would it cover?']
-feedback_cat_count = {answer: feedback_cat.str.count(answer).sum() for answer in feedback_categories }
-
-df_improve_cfrm = pd.DataFrame(list(feedback_cat_count.items()), columns=['Answer', 'Count'])
-
-# Sort data for better visualization
-df_improve_cfrm_sorted = df_improve_cfrm.sort_values('Count', ascending=False)
-
-
-# Create the bar chart with simplified x-axis
-fig_complaint_topic_now = px.bar(
-    df_improve_cfrm_sorted,
-    x='Answer',
-    y='Count',
-    text_auto=True,  # Automatically add text on bars
-    title='Blitz Complaint Topic',
-    color='Answer',  # Color by answer
-    color_continuous_scale='blues'  # Use a blue color scale
-)
-
-# Customize the chart layout
-fig_complaint_topic_now.update_layout(
-    xaxis_title="",
-    yaxis_title="Count",
-    plot_bgcolor='rgba(0,0,0,0)',  # Transparent background
-    paper_bgcolor='rgba(0,0,0,0)',
-    font=dict(color='white'),  # Adjust font color for readability
-    showlegend=True  # Ensure the legend is shown
-)
-
-# Customize x-axis to remove the labels
-fig_complaint_topic_now.update_xaxes(showticklabels=False)  # Hide x-axis labels
-
-# Customize bar appearance
-fig_complaint_topic_now.update_traces(
-    marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
-    marker_line_width=1.5,  # Width of the border
-    opacity=0.8,
-    textangle = 0
-)
-
-# Show the figure
-st.plotly_chart(fig_complaint_topic_now, use_container_width=True)
-
+st.subheader('Respondent explorer')
+questions = {question.column: key for key, question in QUESTIONS.items()}
+left, middle, right = st.columns([3, 2, 2])
+drill_key = questions[left.selectbox("Question", list(questions))]
+answers = data.answers[drill_key]
+if not answers:
+    st.caption("No submission answered this question.")
+else:
+    drill_answer = answers.index(middle.selectbox("Answer", answers))
+    sort_column = right.selectbox("Sort by", list(data.columns))
+    ascending = right.toggle("Ascending", value=True)
+
+    drill = server.drill_rows(snapshot, selection, drill_key, drill_answer, sort_column, ascending)
+    page_size = left.selectbox("Rows per page", [25, 50, 100])
+    pages = max(1, -(-len(drill) // page_size))
+    page = middle.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+    st.caption(f"{len(drill)} respondents")
+    st.dataframe(data.frame(drill[(page - 1) * page_size:page * page_size]), use_container_width=True)
+
+#Exact refinement
+# Swap in the exact figures once computed. Each status update is a point where
+# a new click stops this run, so the filters stay responsive while waiting.
+if pending is not None:
+    status = st.sidebar.empty()
+    while not pending.done():
+        status.caption("Computing exact counts...")
+        wait([pending], timeout=0.25)
+    if pending.cancelled() or pending.exception() is None:
+        st.rerun()
+    status.error("The exact counts could not be computed; the charts stay approximate.")
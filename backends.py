@@ -0,0 +1,222 @@
+"""Query backends: filter the rows by a sidebar selection, count answers by question.
+
+SurveyStore is the default backend ('cubes'): it sums precomputed count cubes
+and never looks at the rows. The backends here answer the same two questions
+from the rows themselves, for comparison (benchmarks/backends.py) and for
+aggregations the cubes do not hold:
+
+* 'pandas' keeps the rows as a DataFrame and counts eagerly with boolean masks,
+  value_counts and str.count, one question after the other.
+* 'duckdb' keeps them as coded columns in an embedded DuckDB database (loaded
+  from Arrow) and computes the counts of every chart in one query that filters
+  once and runs on all cores. It needs the optional duckdb package.
+
+Every backend has ``rows(selection)``, ``count(key, selection)`` and
+``counts(selection)``, returning what the SurveyStore methods of the same
+name return; built from a weighted store they sum the row weights too.
+"""
+import importlib.util
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+from snapshot import answer_counts
+from survey import QUESTIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT = 'cubes'
+
+
+def _columns(data):
+    # The filters and the charted columns, each once
+    return list(dict.fromkeys(list(data.filters) + [question.column for question in QUESTIONS.values()]))
+
+
+def _wanted(values):
+    """(values, whether the missing value is selected) of one filter."""
+    wanted = [value for value in values if not pd.isna(value)]
+    return wanted, len(wanted) < len(values)
+
+
+class PandasBackend:
+    """The rows as a DataFrame, filtered and counted with eager pandas."""
+
+    name = 'pandas'
+
+    def __init__(self, df, answers, weights=None):
+        self.df = df
+        self.answers = answers
+        self.weights = None if weights is None else pd.Series(weights)
+
+    @classmethod
+    def from_store(cls, data):
+        return cls(data.frame(columns=_columns(data)).reset_index(drop=True), data.answers, data.weights)
+
+    def mask(self, selection):
+        mask = np.ones(len(self.df), dtype=bool)
+        for name, values in selection.items():
+            wanted, missing = _wanted(values)
+            selected = self.df[name].isin(wanted)
+            if missing:
+                selected |= self.df[name].isna()
+            mask &= selected.to_numpy()
+        return mask
+
+    def rows(self, selection):
+        return np.flatnonzero(self.mask(selection)).astype(np.int64)
+
+    def _count(self, key, df, weights):
+        question = QUESTIONS[key]
+        col = df[question.column]
+        if question.multi:
+            text = col.astype('string')
+            counts = [text.str.count(re.escape(option)).fillna(0) for option in question.options]
+            counts = [float((found * weights).sum()) if weights is not None else int(found.sum()) for found in counts]
+        elif weights is not None:
+            counts = weights.groupby(col.to_numpy()).sum().reindex(self.answers[key], fill_value=0).to_numpy()
+        else:
+            counts = col.value_counts(sort=False).reindex(self.answers[key], fill_value=0).to_numpy()
+        return answer_counts(key, self.answers[key], counts)
+
+    def _selected(self, selection):
+        mask = self.mask(selection)
+        weights = None if self.weights is None else self.weights[mask].reset_index(drop=True)
+        return self.df[mask].reset_index(drop=True), weights
+
+    def count(self, key, selection):
+        return self._count(key, *self._selected(selection))
+
+    def counts(self, selection):
+        df, weights = self._selected(selection)
+        return {key: self._count(key, df, weights) for key in QUESTIONS}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class DuckDBBackend:
+    """The rows in an in-memory DuckDB database; all counts in one query.
+
+    Columns are stored as the codes SurveyStore uses: a filter as the position
+    of its value in SurveyStore.filters, a single choice question as the
+    position of its answer (NULL when empty) and a multiple choice question as
+    a count column per option. DuckDB compresses and groups small integers far
+    faster than strings.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, table, options, answers, weighted=False):
+        import duckdb
+
+        self.options = options  # filter name -> its values, as SurveyStore.filters
+        self.answers = answers
+        self.weighted = weighted  # The table has a `weight` column to sum
+        self._db = duckdb.connect(':memory:')
+        self._db.register('rows_arrow', table)
+        # Copied into DuckDB's own compressed columns, which scan faster than Arrow
+        self._db.execute('CREATE TABLE survey AS SELECT * FROM rows_arrow')
+        self._db.unregister('rows_arrow')
+
+    @classmethod
+    def from_store(cls, data):
+        import pyarrow as pa
+
+        # Filters f0.., single choice questions by key, options key_0, key_1..,
+        # `row` the row number, `weight` the row weight of a weighted store
+        columns = {f'f{i}': codes for i, codes in enumerate(np.unravel_index(data.cells, data.shape))}
+        for key, question in QUESTIONS.items():
+            if question.multi:
+                for j in range(len(question.options)):
+                    columns[f'{key}_{j}'] = np.asarray(data.multi[key][:, j])
+            else:
+                codes = pd.Index(data.answers[key]).get_indexer(data.column(question.column))
+                columns[key] = pa.array(codes, mask=codes < 0, type=pa.int16())
+        columns['row'] = np.arange(len(data.cells), dtype=np.int64)
+        if data.weights is not None:
+            columns['weight'] = np.asarray(data.weights, dtype=np.float64)
+        return cls(pa.table(columns), data.filters, data.answers, data.weights is not None)
+
+    def __sizeof__(self):
+        # Counted by cache.sizeof, for the memory budget
+        used, = self._query('SELECT COALESCE(SUM(memory_usage_bytes), 0) FROM duckdb_memory()', [])[0]
+        return object.__sizeof__(self) + int(used)
+
+    def _where(self, selection):
+        """SQL condition of `selection`; filters with every value selected are left out."""
+        clauses = []
+        for i, (name, options) in enumerate(self.options.items()):
+            if name not in selection:
+                continue
+            wanted, missing = _wanted(selection[name])
+            positions = [j for j, option in enumerate(options) if (missing if option is None else option in wanted)]
+            if len(positions) < len(options):
+                clauses.append(f'f{i} IN ({", ".join(map(str, positions))})' if positions else 'FALSE')
+        return ' AND '.join(clauses) or 'TRUE'
+
+    def _query(self, sql, params):
+        # A cursor is a connection of its own: sessions can query concurrently
+        cursor = self._db.cursor()
+        try:
+            return cursor.execute(sql, params).fetchall()
+        finally:
+            cursor.close()
+
+    def rows(self, selection):
+        found = self._query(f'SELECT row FROM survey WHERE {self._where(selection)} ORDER BY row', [])
+        return np.array([row for row, in found], dtype=np.int64)
+
+    def count(self, key, selection):
+        return self._counts([key], selection)[key]
+
+    def counts(self, selection):
+        return self._counts(list(QUESTIONS), selection)
+
+    def _counts(self, keys, selection):
+        # The selection is filtered once (MATERIALIZED); single choice questions
+        # are grouped, the option columns of all multiple choice ones summed in
+        # a single pass. Answers come back as positions in self.answers.
+        parts, sums = [], []
+        count, weight = ('SUM(weight)', ' * weight') if self.weighted else ('COUNT(*)', '')
+        for key in keys:
+            if QUESTIONS[key].multi:
+                sums += [(key, j) for j in range(len(QUESTIONS[key].options))]
+                continue
+            column = _quote(key)
+            parts.append(f"SELECT '{key}' AS chart, {column} AS answer, {count} AS n "
+                         f'FROM selected WHERE {column} IS NOT NULL GROUP BY {column}')
+        if sums:
+            charts = ', '.join(f"'{key}'" for key, _ in sums)
+            answers = ', '.join(str(j) for _, j in sums)
+            totals = ', '.join(f'COALESCE(SUM({_quote(f"{key}_{j}")}{weight}), 0)' for key, j in sums)
+            parts.append(f'SELECT UNNEST(charts), UNNEST(answers), UNNEST(totals) FROM '
+                         f'(SELECT [{charts}] AS charts, [{answers}] AS answers, [{totals}] AS totals FROM selected)')
+        sql = (f'WITH selected AS MATERIALIZED (SELECT * FROM survey WHERE {self._where(selection)}) '
+               + ' UNION ALL '.join(parts))
+        dtype = np.float64 if self.weighted else np.int64
+        counts = {key: np.zeros(len(self.answers[key]), dtype) for key in keys}
+        for key, answer, n in self._query(sql, []):
+            counts[key][answer] = n
+        return {key: answer_counts(key, self.answers[key], counts[key]) for key in keys}
+
+
+BACKENDS = {'pandas': PandasBackend, 'duckdb': DuckDBBackend}
+
+
+def backends():
+    # DuckDB is an optional package
+    return [DEFAULT] + [name for name in BACKENDS if name != 'duckdb' or importlib.util.find_spec('duckdb') is not None]
+
+
+def build_backend(data, name=DEFAULT):
+    """The backend `name` over SurveyStore `data`; the store itself for 'cubes' or an unavailable one."""
+    if name != DEFAULT and name not in backends():
+        logger.warning('Query backend %r is not available (%s); using %r', name, ', '.join(backends()), DEFAULT)
+        name = DEFAULT
+    if name == DEFAULT:
+        return data
+    return BACKENDS[name].from_store(data)
@@ -0,0 +1,77 @@
+"""Query backend benchmark: the counts behind every chart, per backend and size.
+
+For each row count, builds every available backend (backends.py) over the same
+synthetic survey and times what a page view asks of it: the counts of all
+charts for the unfiltered view and for a filtered one, and the row numbers of
+the filtered selection. Before timing, every backend's answers are checked
+against the count cubes.
+
+    python benchmarks/backends.py
+    python benchmarks/backends.py --rows 100000 1000000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from backends import backends, build_backend  # noqa: E402
+from snapshot import SurveyStore  # noqa: E402
+from survey import DISTRICT, GENDER, normalize  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+
+
+def best_of(repeat, fn):
+    """Fastest of `repeat` runs of fn(), in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return 1000 * min(times)
+
+
+def check(backend, data, selections):
+    for selection in selections:
+        expected = data.counts(selection)
+        for key, counts in backend.counts(selection).items():
+            pd.testing.assert_series_equal(counts, expected[key], check_dtype=False, check_index_type=False)
+        if (backend.rows(selection) != data.rows(selection)).any():
+            raise AssertionError(f'{backend.name}: rows differ')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3, help='best of N runs is reported (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    names = backends()
+    print(f'backends: {", ".join(names)}\n')
+    print(f'{"rows":>9}  {"backend":>8}  {"build":>9}  {"all charts":>10}  {"filtered":>9}  {"rows()":>9}')
+    for n in args.rows:
+        data = SurveyStore.from_frame(normalize(make_survey(n)))
+        everything = data.default_selection()
+        filtered = data.default_selection()
+        filtered[GENDER] = filtered[GENDER][:1]
+        filtered[DISTRICT] = filtered[DISTRICT][:3]
+        for name in names:
+            started = time.perf_counter()
+            backend = build_backend(data, name)
+            built = time.perf_counter() - started
+            check(backend, data, [everything, filtered])
+            print(f'{n:9d}  {name:>8}  {built:8.2f}s'
+                  f'  {best_of(args.repeat, lambda: backend.counts(everything)):8.1f}ms'
+                  f'  {best_of(args.repeat, lambda: backend.counts(filtered)):7.1f}ms'
+                  f'  {best_of(args.repeat, lambda: backend.rows(filtered)):7.1f}ms')
+            del backend
+    print('\nbuild: once per dataset version (the cubes are built with the snapshot); '
+          'the other columns: per page view, best of', args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Chart pool benchmark: page build time against the number of workers.
+
+Builds the figures of a series of different selections (nothing cached) on
+the script thread, then on thread and process pools of 1, 2, 4.. workers up to
+the number of cores, as server.get_chart_pool sets them up. Reports the time
+per page and the speedup over the script thread.
+
+    python benchmarks/parallel.py
+    python benchmarks/parallel.py --backend duckdb --rows 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import streamlit  # noqa: E402,F401  (sets the plotly default template, as in the app)
+
+from backends import backends, build_backend  # noqa: E402
+from charts import build_figures  # noqa: E402
+from snapshot import SurveyStore  # noqa: E402
+from survey import normalize  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+
+
+def selections(data, n, seed=0):
+    """`n` different sidebar selections, each filter keeping a random half or more."""
+    rng = np.random.default_rng(seed)
+    found = []
+    for _ in range(n):
+        selection = {}
+        for name, options in data.filters.items():
+            keep = rng.random(len(options)) < 0.7
+            keep[rng.integers(len(options))] = True
+            selection[name] = [option for option, kept in zip(options, keep) if kept]
+        found.append(selection)
+    return found
+
+
+def page_ms(backend, pages, pool, workers=1):
+    build_figures(backend, pages[0], pool, workers)  # Workers started and warm
+    started = time.perf_counter()
+    for selection in pages:
+        build_figures(backend, selection, pool, workers)
+    return 1000 * (time.perf_counter() - started) / len(pages)
+
+
+def worker_counts(cores):
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help='synthetic rows (default: %(default)s)')
+    parser.add_argument('--backend', default='cubes', choices=backends())
+    parser.add_argument('--pages', type=int, default=20, help='selections built per measurement (default: %(default)s)')
+    parser.add_argument('--workers', type=int, nargs='+', help='pool sizes (default: 1, 2, 4.. up to the cores)')
+    args = parser.parse_args(argv)
+
+    data = SurveyStore.from_frame(normalize(make_survey(args.rows)))
+    backend = build_backend(data, args.backend)
+    pages = selections(data, args.pages)
+    cores = os.cpu_count() or 1
+
+    print(f'{args.rows} rows, {args.backend} backend, {cores} cores\n')
+    sequential = page_ms(backend, pages, None)
+    print(f'{"pool":>8}  {"workers":>7}  {"per page":>9}  {"speedup":>7}')
+    print(f'{"none":>8}  {"-":>7}  {sequential:7.1f}ms  {1:6.2f}x')
+    for kind in ('thread', 'process'):
+        for workers in args.workers or worker_counts(cores):
+            if kind == 'thread':
+                pool = ThreadPoolExecutor(workers)
+            else:
+                pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+            with pool:
+                ms = page_ms(backend, pages, pool, workers)
+            print(f'{kind:>8}  {workers:7d}  {ms:7.1f}ms  {sequential / ms:6.2f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Figure payload benchmark: bytes sent to the browser per figure and page.
+
+Figures are serialized exactly as ``st.plotly_chart`` does before they go over
+the websocket. With kaleido installed the low-bandwidth mode is measured too:
+the rendered images, against the figure JSON plus the plotly.js chunk that the
+interactive mode makes the browser download. Both are also measured as sent
+over the deflated websocket (.streamlit/config.toml): figure JSON as is, SVG as
+the base64 data URL st.image makes of it. PNG goes through the media endpoint
+and does not compress. The default (all selected) view is measured, as is the
+one-off payload of the browser-side filtering mode.
+
+    python benchmarks/payload.py
+    python benchmarks/payload.py --csv survey.csv
+"""
+import argparse
+import base64
+import glob
+import gzip
+import json
+import os
+import sys
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit  # noqa: E402,F401  (sets the plotly default template, as in the app)
+import plotly.tools  # noqa: E402
+import plotly.utils  # noqa: E402
+
+from charts import build_figures, images_available, render_image  # noqa: E402
+from cube_view import payload  # noqa: E402
+from snapshot import SurveyStore  # noqa: E402
+from survey import normalize  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+
+
+def payload_json(figure):
+    figure = plotly.tools.return_figure_from_figure_or_data(figure, validate_figure=True)
+    return json.dumps(figure, cls=plotly.utils.PlotlyJSONEncoder).encode('utf-8')
+
+
+def payload_bytes(figure):
+    return len(payload_json(figure))
+
+
+def deflated(body):
+    """Bytes of `body` as a permessage-deflate websocket frame."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return len(compressor.compress(body) + compressor.flush())
+
+
+def svg_message(svg):
+    # st.image sends SVG markup inline, as a base64 data URL
+    return b'data:image/svg+xml;base64,' + base64.b64encode(svg.encode('utf-8'))
+
+
+def plotly_bundle_bytes():
+    """(raw, gzipped) size of the frontend chunk that carries plotly.js."""
+    static = os.path.join(os.path.dirname(streamlit.__file__), 'static', 'static', 'js')
+    for path in glob.glob(os.path.join(static, '*.chunk.js')):
+        with open(path, 'rb') as fh:
+            body = fh.read()
+        if b'Plotly.newPlot' in body:
+            return len(body), len(gzip.compress(body))
+    return 0, 0
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', help='survey export to measure (default: synthetic)')
+    parser.add_argument('--rows', type=int, default=5000, help='synthetic rows (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.csv, sep=';') if args.csv else make_survey(args.rows)
+    data = SurveyStore.from_frame(normalize(df))
+    figures = build_figures(data, data.default_selection())
+
+    with_images = images_available()
+    totals = [0] * 5
+    print(f'{"json":>9}  {"json.ws":>9}  {"png":>9}  {"svg":>9}  {"svg.ws":>9}  traces  chart')
+    for key, figure in figures.items():
+        body = payload_json(figure)
+        sizes = [len(body), deflated(body), 0, 0, 0]
+        if with_images:
+            svg = svg_message(render_image(figure, 'svg'))
+            sizes[2:] = [len(render_image(figure, 'png')), len(svg), deflated(svg)]
+        totals = [total + size for total, size in zip(totals, sizes)]
+        print('  '.join(f'{size:9,d}' for size in sizes) + f'  {len(figure.data):6d}  {key}')
+    print('  '.join(f'{total:9,d}' for total in totals) + f'          page ({len(figures)} figures)')
+
+    json_total, json_sent, png_total, _, svg_sent = totals
+    bundle, bundle_gz = plotly_bundle_bytes()
+    print(f'\ninteractive page weight: {json_total:,d} B figure JSON ({json_sent:,d} B sent deflated) '
+          f'+ {bundle:,d} B plotly.js chunk ({bundle_gz:,d} B gzipped, once: cached by the browser)')
+    if with_images:
+        print(f'low-bandwidth page weight: {svg_sent:,d} B SVG sent deflated ({png_total:,d} B as PNG), no plotly.js')
+        if svg_sent > json_sent:
+            print(f'low-bandwidth sends less up to {bundle_gz // (svg_sent - json_sent)} page views '
+                  f'of a visit ({bundle_gz // max(png_total - json_sent, 1)} with PNG)')
+    else:
+        print('low-bandwidth mode not measured: kaleido is not installed')
+    body = json.dumps(payload('bench', data, figures)).encode('utf-8')
+    print(f'browser-side filtering: {len(body):,d} B once per dataset version '
+          f'({len(gzip.compress(body)):,d} B gzipped), nothing when a filter changes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Batch report benchmark: reports per second against the number of workers.
+
+Writes a synthetic survey as a snapshot bundle, maps it as reports.py does
+and generates the reports of every district, then of every gender x district
+combination, in this process and on 1, 2, 4.. forked workers up to the number
+of cores. Reports go to a temporary directory.
+
+    python benchmarks/reports.py
+    python benchmarks/reports.py --rows 1000000 --workers 1 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel import worker_counts  # noqa: E402
+from reports import generate  # noqa: E402
+from snapshot import SurveyStore, load_bundle, write_bundle  # noqa: E402
+from survey import DISTRICT, GENDER, normalize  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000, help='synthetic rows (default: %(default)s)')
+    parser.add_argument('--workers', type=int, nargs='+', help='pool sizes (default: 1, 2, 4.. up to the cores)')
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_bundle(SurveyStore.from_frame(normalize(make_survey(args.rows))), tmp, 'bench')
+        data = load_bundle(path)
+        print(f'{args.rows} rows (mapped bundle), {cores} cores\n')
+        print(f'{"reports":>17}  {"workers":>7}  {"total":>7}  {"per report":>10}  {"speedup":>7}')
+        for label, by in (('district', [DISTRICT]), ('gender x district', [GENDER, DISTRICT])):
+            sequential = None
+            for workers in [0] + (args.workers or worker_counts(cores)):
+                started = time.perf_counter()
+                written = generate(data, os.path.join(tmp, 'reports'), by, 'bench', workers)
+                seconds = time.perf_counter() - started
+                sequential = sequential or seconds
+                print(f'{label:>17}  {workers or "-":>7}  {seconds:6.2f}s  {1000 * seconds / len(written):8.0f}ms'
+                      f'  {sequential / seconds:6.2f}x')
+    print('\n-: in this process; the total includes forking the workers and writing plotly.min.js and the index')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
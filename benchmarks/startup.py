@@ -0,0 +1,83 @@
+"""Startup benchmark: import-time profile and budget for a fresh worker.
+
+Runs ``python -X importtime -c "import <module>"`` in a clean interpreter,
+prints where the time goes (per top-level package and the slowest modules) and
+fails when the import takes longer than the budget or pulls in a module that
+must stay lazy.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --budget 1.5 --runs 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported only once a chart is actually built (plotly.graph_objects is not
+# listed: streamlit's plotly theme imports it when streamlit is imported)
+LAZY = ['plotly.express', 'charts']
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def profile(module):
+    """Return [(self_us, cumulative_us, depth, name)] for importing `module`."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    return rows
+
+
+def report(rows, top):
+    total = sum(row[0] for row in rows)
+    packages = Counter()
+    for self_us, _, _, name in rows:
+        packages[name.split('.')[0]] += self_us
+    print(f'{len(rows)} modules, {total / 1e6:.3f}s total')
+    print('\nby top-level package (self time)')
+    for name, us in packages.most_common(top):
+        print(f'  {us / 1e6:8.3f}s  {100 * us / total:5.1f}%  {name}')
+    print('\nslowest modules (self time)')
+    for self_us, cumulative_us, _, name in sorted(rows, reverse=True)[:top]:
+        print(f'  {self_us / 1e6:8.3f}s  (cumulative {cumulative_us / 1e6:.3f}s)  {name}')
+    return total / 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='server', help='module a worker imports first (default: %(default)s)')
+    parser.add_argument('--budget', type=float, default=2.0, help='seconds allowed for the import (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=3, help='best of N runs is checked (default: %(default)s)')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args(argv)
+
+    runs = [profile(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda rows: sum(row[0] for row in rows))
+    seconds = report(best, args.top)
+
+    failures = []
+    if seconds > args.budget:
+        failures.append(f'import {args.module} took {seconds:.3f}s, budget is {args.budget:.3f}s')
+    imported = {row[3] for row in best}
+    failures += [f'{name} is imported at startup' for name in LAZY if name in imported]
+    print()
+    for failure in failures:
+        print('FAIL', failure)
+    if not failures:
+        print(f'OK import {args.module}: {seconds:.3f}s of {args.budget:.3f}s budget')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Synthetic survey exports for the benchmarks.
+
+Answers are drawn from the vocabularies in survey.py so every chart has data;
+multiple choice answers join one to three options the way the export does.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from survey import AGE, AGE_GROUP, DISTRICT, GENDER, LABELS, QUESTIONS, USAGE  # noqa: E402
+
+DISTRICTS = ['Kyiv', 'Kharkiv', 'Odesa', 'Dnipro', 'Lviv', 'Zaporizhzhia', 'Mykolaiv', 'Chernihiv']
+SINGLE_CHOICE = {
+    GENDER: ['Female', 'Male'],
+    USAGE: ['Never', 'Once', 'Several times'],
+    DISTRICT: DISTRICTS,
+    'How likely are you to submit a non-sensitive complaint?': ['Very likely', 'Likely', 'Unlikely', 'Very unlikely'],
+    'How likely are you to submit a sensitive complaint?': ['Very likely', 'Likely', 'Unlikely', 'Very unlikely'],
+    'How did you submit your complaint/feedback?': ['Hotline', 'In person', 'Feedback box', 'Email'],
+    'What type of submission you made?': ['Complaint', 'Feedback', 'Request'],
+    'Did anyone from INTERSOS reached out to you after your complaint/feedback?': ['Yes', 'No'],
+    'Do you feel like INTERSOS did their best to implement your complaint/feedback?': ['Yes', 'No', 'Partially'],
+}
+RATING = ['Very Good', 'Good', 'Neutral', 'Bad', 'Very Bad']
+FREE_TEXT = ['', '', '', 'The hotline was busy in the evening', 'Need more leaflets in Ukrainian',
+             'Staff were very kind', 'Waited two weeks for an answer', 'Please add a Viber channel']
+
+
+def make_survey(rows, seed=0):
+    """A raw (not normalized) export with `rows` submissions."""
+    rng = np.random.default_rng(seed)
+    data = {'Submission ID': np.arange(1, rows + 1)}
+    for column in (GENDER, USAGE, DISTRICT):
+        choices = SINGLE_CHOICE[column]
+        data[column] = np.asarray(choices, dtype=object)[rng.integers(len(choices), size=rows)]
+    for question in QUESTIONS.values():
+        column = question.column
+        if column in data or column == AGE_GROUP:
+            continue
+        if question.multi:
+            options = np.array([o if o.endswith(';') else o + ';' for o in question.options], dtype=object)
+            picks = rng.random((rows, len(options))) < 1.5 / len(options)
+            data[column] = [''.join(options[p]) for p in picks]
+        else:
+            choices = SINGLE_CHOICE.get(column) or list(LABELS.get(column, {})) or RATING
+            data[column] = np.asarray(choices, dtype=object)[rng.integers(len(choices), size=rows)]
+    data[AGE] = rng.integers(10, 80, size=rows)
+    data['Other (please specify)'] = np.asarray(FREE_TEXT, dtype=object)[rng.integers(len(FREE_TEXT), size=rows)]
+    return pd.DataFrame(data)
+
+
+def write_csv(path, rows, seed=0):
+    make_survey(rows, seed).to_csv(path, sep=';', index=False)
+    return path
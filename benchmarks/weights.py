@@ -0,0 +1,75 @@
+"""Weighting benchmark: chart counts of weighted and unweighted views.
+
+Builds a synthetic survey, weights it to a random population per district,
+gender and age band (weights.py), and times the counts of all charts for the
+unfiltered and a filtered view on both stores, plus the one-off weighting
+(row weights and weighted cubes) done once per dataset version.
+
+    python benchmarks/weights.py
+    python benchmarks/weights.py --rows 1000000 --repeat 5
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from snapshot import SurveyStore  # noqa: E402
+from survey import AGE_LABELS, DISTRICT, GENDER, normalize  # noqa: E402
+from synthetic import make_survey  # noqa: E402
+from weights import row_weights  # noqa: E402
+
+
+def best_of(repeat, fn):
+    """Fastest of `repeat` runs of fn(), in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return 1000 * min(times)
+
+
+def population(data, seed=0):
+    """A weights table giving every group a random population."""
+    rng = np.random.default_rng(seed)
+    groups = list(itertools.product(data.options(DISTRICT), data.options(GENDER), AGE_LABELS))
+    table = pd.DataFrame([[str(value) for value in group] for group in groups],
+                         columns=['district', 'gender', 'age_band'])
+    table['population'] = rng.integers(1000, 50000, len(table))
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3, help='best of N runs is reported (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    print(f'{"rows":>9}  {"view":>10}  {"weighting":>9}  {"all charts":>10}  {"filtered":>9}')
+    for n in args.rows:
+        data = SurveyStore.from_frame(normalize(make_survey(n)))
+        started = time.perf_counter()
+        weighted = data.weighted(row_weights(data, population(data)))
+        built = time.perf_counter() - started
+        everything = data.default_selection()
+        filtered = data.default_selection()
+        filtered[GENDER] = filtered[GENDER][:1]
+        filtered[DISTRICT] = filtered[DISTRICT][:3]
+        for name, store in (('unweighted', data), ('weighted', weighted)):
+            weighting = f'{built:8.2f}s' if store is weighted else f'{"-":>9}'
+            print(f'{n:9d}  {name:>10}  {weighting}'
+                  f'  {best_of(args.repeat, lambda: store.counts(everything)):8.1f}ms'
+                  f'  {best_of(args.repeat, lambda: store.counts(filtered)):7.1f}ms')
+    print('\nweighting: once per dataset version and weights file; the other columns: per page view, best of',
+          args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Multi-worker memory benchmark: one mapped bundle against private copies.
+
+Starts N fresh worker processes that each load the dataset and run a few
+queries, then reads their memory from /proc (Linux) while all of them are
+alive. RSS counts a shared page in every process that touches it, so the
+sum is reported as PSS, which splits shared pages between their users: with
+the bundle mapped read-only the dataset's share stays flat as workers are
+added, with private copies (every worker parsing the CSV) it grows with them.
+The interpreter and libraries of each worker are private either way and are
+left out of the dataset column.
+
+    python benchmarks/workers.py
+    python benchmarks/workers.py --rows 500000 --workers 1 2 4 8
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory():
+    """(rss, pss) of this process in bytes."""
+    values = {}
+    with open('/proc/self/smaps_rollup') as fh:
+        for line in fh:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                values[name] = int(rest.split()[0]) * 1024
+    return values['Rss'], values['Pss']
+
+
+def worker(mode, source, barrier, results):
+    import numpy as np
+
+    from snapshot import build_store, load_bundle
+
+    before = memory()
+    if mode == 'shared':
+        data = load_bundle(source)
+    else:
+        with open(source, 'rb') as fh:
+            data = build_store(fh.read())
+    # What sessions do: every chart's counts, rows of a selection, a search;
+    # then read every array so all of the dataset's pages are resident
+    selection = data.default_selection()
+    for key in data.cubes:
+        data.count(key, selection)
+    data.rows(selection)
+    data.search('hotline')
+    arrays = list(data.columns.values()) + list(data.cubes.values()) + list(data.multi.values())
+    arrays += [data.cells, data.order, data.offsets, data.text.offsets, data.text.postings]
+    for array in arrays:
+        np.asarray(array).sum()
+    barrier.wait()  # Measure while every worker holds the dataset
+    rss, pss = memory()
+    results.put((rss, pss, pss - before[1]))
+    barrier.wait()
+
+
+def run(mode, source, workers):
+    ctx = multiprocessing.get_context('spawn')  # No pages inherited from this process
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(mode, source, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return [sum(column) for column in zip(*rows)]
+
+
+def main(argv=None):
+    from snapshot import build_store, write_bundle
+    from synthetic import write_csv
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000, help='synthetic rows (default: %(default)s)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed growth of the shared dataset PSS from 1 to N workers (default: %(default)s)')
+    args = parser.parse_args(argv)
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print('needs Linux /proc/self/smaps_rollup')
+        return 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv = write_csv(os.path.join(tmp, 'survey.csv'), args.rows)
+        with open(csv, 'rb') as fh:
+            bundle = write_bundle(build_store(fh.read()), os.path.join(tmp, 'snapshots'), 'bench')
+        mb = 2 ** 20
+        print(f'{args.rows} rows\n')
+        print(f'{"mode":>8}  {"workers":>7}  {"sum RSS":>9}  {"sum PSS":>9}  {"dataset PSS":>11}')
+        dataset = {}
+        for mode, source in (('shared', bundle), ('private', csv)):
+            for n in args.workers:
+                rss, pss, loaded = run(mode, source, n)
+                dataset[mode, n] = loaded
+                print(f'{mode:>8}  {n:7d}  {rss / mb:7.1f}MB  {pss / mb:7.1f}MB  {loaded / mb:9.1f}MB')
+
+    first, last = min(args.workers), max(args.workers)
+    growth = dataset['shared', last] / dataset['shared', first] - 1
+    print(f'\nshared dataset PSS from {first} to {last} workers: {growth:+.0%} '
+          f'(private copies: {dataset["private", last] / dataset["private", first] - 1:+.0%})')
+    if growth > args.tolerance:
+        print(f'FAIL shared dataset memory grew more than {args.tolerance:.0%}')
+        return 1
+    print('OK memory stays flat as workers are added')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""In-memory caches of the process and the governor keeping them in budget.
+
+Every LRUCache reports the approximate size of its entries to a
+CacheGovernor. When the caches (plus pinned usage such as the dataset being
+served) exceed the budget, the governor evicts across all caches with
+GreedyDual-Size: an entry's priority is the clock plus the seconds it took to
+compute per byte, refreshed on every hit, and the lowest priority goes first.
+Cheap, large and long unused entries leave before expensive, small, hot ones.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def sizeof(value, _seen=None):
+    """Approximate bytes held by `value`.
+
+    Arrays count their buffers, containers and objects are walked. Memory
+    mapped arrays count as 0: their pages belong to the OS page cache and
+    are shared between processes.
+    """
+    # id -> object: keeps temporaries (plotly JSON) alive so ids are not reused
+    seen = {} if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen[id(value)] = value
+    if isinstance(value, np.memmap):
+        return 0
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return value.nbytes + sum(sizeof(item, seen) for item in value.flat)
+        return value.nbytes
+    if isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, (bytes, bytearray, str, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k, seen) + sizeof(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(sizeof(item, seen) for item in value)
+    if hasattr(value, 'to_plotly_json'):
+        return sizeof(value.to_plotly_json(), seen)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + sizeof(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+class CacheGovernor:
+    """Global memory budget shared by the registered caches."""
+
+    def __init__(self, budget=512 * 2 ** 20):
+        self.budget = budget
+        self.clock = 0.0  # GreedyDual-Size inflation value
+        self.evictions = 0
+        self._caches = []
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    def register(self, cache):
+        with self._lock:
+            self._caches.append(cache)
+
+    def pin(self, name, report):
+        """Count usage that is never evicted (the served dataset): report() -> bytes."""
+        with self._lock:
+            self._pinned[name] = report
+
+    def pinned_bytes(self):
+        return {name: report() for name, report in self._pinned.items()}
+
+    @property
+    def bytes(self):
+        return sum(cache.bytes for cache in self._caches) + sum(self.pinned_bytes().values())
+
+    def enforce(self):
+        """Evict the lowest priority entries until usage is within budget."""
+        with self._lock:
+            pinned = sum(self.pinned_bytes().values())
+            while pinned + sum(cache.bytes for cache in self._caches) > self.budget:
+                victims = [(cache.coldest(), cache) for cache in self._caches if len(cache)]
+                victims = [(found, cache) for found, cache in victims if found is not None]
+                if not victims:
+                    break
+                (priority, key), cache = min(victims, key=lambda victim: victim[0][0])
+                if cache.evict(key):
+                    self.clock = max(self.clock, priority)
+                    self.evictions += 1
+
+    def report(self):
+        """One row per cache plus the pinned usage, for the debug panel."""
+        rows = [cache.stats() for cache in self._caches]
+        rows += [{'cache': name, 'entries': 1, 'bytes': size, 'hits': None, 'misses': None, 'evictions': None}
+                 for name, size in self.pinned_bytes().items()]
+        return rows
+
+
+# The governor of this process; server.py sets its budget from the secrets
+GOVERNOR = CacheGovernor()
+
+
+class LRUCache:
+    """Thread-safe mapping that drops the least recently used entries.
+
+    Registered with `governor` (by default the process one), its entries also
+    count against the global memory budget.
+    """
+
+    def __init__(self, max_entries=64, name=None, governor=GOVERNOR):
+        self.max_entries = max_entries
+        self.name = name
+        self.governor = governor
+        self._entries = OrderedDict()
+        self._meta = {}  # key -> [size, cost, priority]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        if governor is not None:
+            governor.register(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _priority(self, size, cost):
+        clock = self.governor.clock if self.governor is not None else 0.0
+        return clock + cost / max(size, 1)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            meta = self._meta[key]
+            meta[2] = self._priority(meta[0], meta[1])
+            return self._entries[key]
+
+    def put(self, key, value, cost=0.0):
+        """Store `value`; `cost` is the seconds it took to compute."""
+        size = sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._meta[key][0]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._meta[key] = [size, cost, self._priority(size, cost)]
+            self.bytes += size
+            while len(self._entries) > self.max_entries:
+                old, _ = self._entries.popitem(last=False)
+                self.bytes -= self._meta.pop(old)[0]
+                self.evictions += 1
+        # Outside our lock: the governor takes the locks of all caches
+        if self.governor is not None:
+            self.governor.enforce()
+
+    def get_or_set(self, key, compute):
+        # compute() runs outside the lock; two sessions asking for the same
+        # missing key may both compute it, the last one wins
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            started = time.perf_counter()
+            value = compute()
+            self.put(key, value, time.perf_counter() - started)
+        return value
+
+    def coldest(self):
+        """(priority, key) of the entry the governor should evict first, or None."""
+        with self._lock:
+            if not self._meta:
+                return None
+            key = min(self._meta, key=lambda k: self._meta[k][2])
+            return self._meta[key][2], key
+
+    def evict(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return False
+            del self._entries[key]
+            self.bytes -= self._meta.pop(key)[0]
+            self.evictions += 1
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._meta.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {'cache': self.name, 'entries': len(self), 'bytes': self.bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
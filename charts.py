@@ -0,0 +1,336 @@
+import importlib.util
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.colors import qualitative, sequential
+from plotly.utils import PlotlyJSONEncoder
+
+# How every chart of the page is drawn from the answer counts of its question
+# (SurveyStore.count); CHARTS lists them in page order.
+
+TRANSPARENT = 'rgba(0,0,0,0)'
+
+# Styling shared by every figure, registered once as the 'cfrm' template. It
+# does not extend plotly's or Streamlit's default template, so each figure only
+# carries these few keys; the browser still applies the Streamlit theme.
+pio.templates['cfrm'] = go.layout.Template(
+    layout=dict(
+        paper_bgcolor=TRANSPARENT,  # Transparent background
+        plot_bgcolor=TRANSPARENT,
+        piecolorway=sequential.RdBu_r,  # Blue color scheme of the pie charts
+        xaxis_automargin=True,  # Room for long answer labels
+    ),
+    data=dict(
+        bar=[go.Bar(
+            marker_line_color='rgb(8,48,107)',  # Dark blue border for bars
+            marker_line_width=1.5,
+            opacity=0.8  # Slight transparency
+        )],
+        pie=[go.Pie(
+            textinfo='percent+label',
+            marker_line_color='#000000',  # Adds a line around each segment
+            marker_line_width=2
+        )],
+    ),
+)
+
+RATING_ORDER = ['Very Good', 'Good', 'Neutral', 'Bad', 'Very Bad']
+SEGMENT_PALETTE = qualitative.Plotly
+DIFFERENCE = 10  # Percentage points between segments that get flagged
+RATING_COLORS = ['blue', 'lightblue', 'gray', 'lightcoral', 'red']
+BAR_PALETTE = sequential.RdBu_r
+HIGHLIGHT = 'gold'
+
+
+# -- Figure factory
+# One trace per figure; bars get their colours as a per-bar array instead of
+# one trace per category.
+
+def bar_colors(n, palette):
+    return [palette[i % len(palette)] for i in range(n)]
+
+
+def pie_chart(counts, title, pull=None):
+    fig = go.Figure(go.Pie(labels=counts.index.tolist(), values=counts.tolist(), pull=pull))
+    fig.update_layout(template='cfrm', title_text=title)
+    return fig
+
+
+def bar_chart(counts, title, palette=BAR_PALETTE, xaxis_title='Response', yaxis_title='Count',
+              text=True, textangle=None):
+    fig = go.Figure(go.Bar(
+        x=counts.index.tolist(),
+        y=counts.tolist(),
+        marker_color=bar_colors(len(counts), palette),
+        texttemplate='%{y}' if text else None,  # Count on each bar
+        textangle=textangle
+    ))
+    fig.update_layout(
+        template='cfrm',
+        title_text=title,
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        font_color='white'  # Adjust font color for readability
+    )
+    return fig
+
+
+class Chart:
+    """How the counts of one question are drawn.
+
+    `order` fixes the answers shown (missing ones get `fill`); otherwise
+    `sort=True` orders multiple choice options by count. Single choice counts
+    arrive sorted from SurveyStore.count already.
+    """
+
+    def __init__(self, kind, title, order=None, fill=None, sort=False, pull_largest=False, **style):
+        self.kind = kind
+        self.title = title
+        self.order = order
+        self.fill = fill
+        self.sort = sort
+        self.pull_largest = pull_largest
+        self.style = style
+
+    def arrange(self, counts):
+        if self.order is not None:
+            return counts.reindex(self.order, fill_value=self.fill)
+        if self.sort:
+            return counts.sort_values(ascending=False, kind='stable')
+        return counts
+
+    def figure(self, counts):
+        counts = self.arrange(counts)
+        if self.kind == 'pie':
+            # Pull the largest segment slightly out
+            pull = [0.1 if value == counts.max() else 0 for value in counts] if self.pull_largest else None
+            return pie_chart(counts, self.title, pull=pull)
+        return bar_chart(counts, self.title, **self.style)
+
+    def comparison(self, table, sizes, label):
+        """Grouped bars of the segments of SurveyStore.compare, as shares of their respondents.
+
+        Answers whose shares differ by DIFFERENCE points or more between the
+        segments are flagged above their group.
+        """
+        table = table.reindex(self.arrange(table.sum(axis=1)).index)
+        shares = (100 * table / sizes.replace(0, float('nan')).to_numpy()).round(1)
+        traces = []
+        for i, segment in enumerate(table.columns):
+            name = '(blank)' if segment is None else str(segment)
+            traces.append(go.Bar(
+                x=table.index.tolist(),
+                y=shares.iloc[:, i].tolist(),
+                customdata=table.iloc[:, i].tolist(),
+                name=name,
+                marker_color=SEGMENT_PALETTE[i % len(SEGMENT_PALETTE)],
+                hovertemplate=f'{name}: %{{y}}% (%{{customdata}} of {sizes.iloc[i]})<extra></extra>',
+            ))
+        spread = shares.max(axis=1) - shares.min(axis=1)
+        # Passed whole: add_annotation() revalidates the layout on every call
+        flags = [dict(x=answer, y=shares.loc[answer].max(), text=f'Δ {difference:.0f} pts',
+                      showarrow=False, yshift=12, font_color=HIGHLIGHT)
+                 for answer, difference in spread[spread >= DIFFERENCE].items()]
+        return go.Figure(traces, layout=dict(
+            template='cfrm',
+            title_text=f'{self.title} by {label}',
+            barmode='group',
+            yaxis_title='% of respondents',
+            xaxis_title=self.style.get('xaxis_title', 'Response'),
+            font_color='white',
+            annotations=flags,
+        ))
+
+    def spec(self):
+        # What the browser needs to redraw the chart from new counts (cube_view.py)
+        return {
+            'kind': self.kind,
+            'order': self.order,
+            'fill': self.fill,
+            'sort': self.sort,
+            'pull_largest': self.pull_largest,
+            'palette': list(self.style.get('palette', BAR_PALETTE)),
+        }
+
+
+def options_chart(title, **style):
+    # Multiple choice questions, most frequent option first
+    return Chart('bar', title, sort=True, **style)
+
+
+def rating_chart(title):
+    # Rating scale in fixed order, from blue (very good) to red (very bad)
+    return Chart('bar', title, order=RATING_ORDER, palette=RATING_COLORS, textangle=0)
+
+
+# -- Charts
+
+# Charts in page order; keys match survey.QUESTIONS
+CHARTS = {
+    'gender': Chart('pie', 'Gender Disaggregation'),
+    'age': Chart('pie', 'Age Disaggregation'),
+    'pwd': options_chart('Type of Impairments', palette=qualitative.Plotly, xaxis_title=None),
+    'usage': Chart('pie', 'CFRM Usage (How often you used CFRM?)', pull_largest=True),
+    'cfrm_awareness': Chart('pie', 'CFRM Awareness Disaggregation'),
+    'info': options_chart('Ways People Learned About CFRM', xaxis_title='Information Source', textangle=0),
+    'preferred_info': options_chart('Preferred Ways to Learn About CFRM',
+                                    xaxis_title='Preferred Information Source', textangle=0),
+    'complaint_choice': Chart(
+        'bar', 'Q: Would you try to solve your problem on your own before submitting a complaint?',
+        order=['Straight to Complaint', 'Unlikely', 'Possibly', 'Consider', 'Definitely'],
+        fill=0,
+        palette=['blue', 'lightblue', 'lightcoral', 'coral', 'red'],  # Diverging, bright blue to red
+        xaxis_title='Response Categories',
+        yaxis_title='Count of Responses',
+        text=False
+    ),
+    'nonsens': Chart('bar', 'How Likely Are You to Submit a Non-Sensitive Complaint?'),
+    'sens_comp': Chart('bar', 'How Likely Are You to Submit a Sensitive Complaint?'),
+    'concerns': options_chart('Preferred Ways to Learn About CFRM', xaxis_title='Beneficiary Concerns about CFRM'),
+    'so': Chart('bar', 'How did you submit your complaint/feedback?', textangle=0),
+    'st': Chart('bar', 'What type of submission you made?', textangle=0),
+    'flup': Chart('pie', 'Did anyone from INTERSOS reached out to you after your complaint/feedback?'),
+    'st1': rating_chart('Experience Rating of Submitting a Complaint/Feedback'),
+    'st2': rating_chart('Experience Rating of Receiving Follow Up'),
+    'st3': rating_chart('Experience Rating of receiving updates'),
+    'st4': rating_chart('Experience Rating of implementation of complaint/feedback'),
+    'follow_up_aftercall': Chart('bar', 'Received follow up updates'),
+    'complaint_res': Chart('bar', 'Complaint Resolution Chart'),
+    'cr_opinion': Chart('pie', 'Do you feel like INTERSOS did their best to implement your complaint/feedback?'),
+    'com_nonsens': options_chart('Prefered Communication Channels (Non-sensetive)',
+                                 palette=qualitative.Plotly, xaxis_title=None),
+    'com_sens': options_chart('Prefered Communication Channels (Sensetive)',
+                              palette=qualitative.Plotly, xaxis_title=None, textangle=0),
+    'improve_cfrm': options_chart('Key Aspects to Improve', palette=qualitative.Plotly, xaxis_title=None, textangle=0),
+    'improve_overall': options_chart('Key Aspects that encourage usage',
+                                     palette=qualitative.Plotly, xaxis_title=None, textangle=0),
+    'complaint_topic_now': options_chart('Blitz Complaint Topic', palette=qualitative.Plotly, xaxis_title=None, textangle=0),
+}
+
+
+def build_figure(data, key, selection):
+    return CHARTS[key].figure(data.count(key, selection))
+
+
+def figure_spec(key, counts):
+    """Plotly JSON of chart `key`; what the workers of a process pool send back."""
+    return CHARTS[key].figure(counts).to_plotly_json()
+
+
+def build_figures(data, selection, pool=None, workers=1):
+    """Every chart of `selection` in page order; `data` is a SurveyStore or a backend of backends.py.
+
+    With a thread `pool` each chart counts and builds in a task of its own. A
+    process pool gets the counts (one query for all charts) in a batch per
+    worker, of `workers`, and sends back plotly JSON, already validated there.
+    """
+    if isinstance(pool, ThreadPoolExecutor):
+        futures = [pool.submit(build_figure, data, key, selection) for key in CHARTS]
+        return {key: future.result() for key, future in zip(CHARTS, futures)}
+    counts = data.counts(selection)  # One query for all charts
+    if pool is None:
+        return {key: CHARTS[key].figure(counts[key]) for key in CHARTS}
+    specs = pool.map(figure_spec, CHARTS, [counts[key] for key in CHARTS], chunksize=-(-len(CHARTS) // workers))
+    return {key: go.Figure(spec, _validate=False) for key, spec in zip(CHARTS, specs)}
+
+
+def comparison_figures(data, selection, name, segments, label):
+    """Every chart comparing `segments` (values of filter `name`) within `selection`."""
+    sizes = data.segment_sizes(selection, name, segments)
+    return {key: chart.comparison(data.compare(key, selection, name, segments), sizes, label)
+            for key, chart in CHARTS.items()}
+
+
+def highlight(fig, matched):
+    """Copy of `fig` marking how many of its answers come from matched submissions.
+
+    `matched` are the counts of the matched submissions per answer: bars get a
+    narrower bar inside them, pie segments are pulled out and labelled.
+    """
+    fig = go.Figure(fig)
+    trace = fig.data[0]
+    if trace.type == 'pie':
+        values = [int(matched.get(label, 0)) for label in trace.labels]
+        trace.update(pull=[0.1 if value else 0 for value in values], customdata=values,
+                     texttemplate='%{label}<br>%{percent}<br>%{customdata} matching')
+        return fig
+    fig.add_trace(go.Bar(
+        x=trace.x,
+        y=[int(matched.get(label, 0)) for label in trace.x],
+        marker_color=HIGHLIGHT,
+        marker_line_width=0,
+        opacity=1,
+        width=0.4,
+        hovertemplate='%{x}: %{y} matching<extra></extra>'
+    ))
+    fig.update_layout(barmode='overlay', showlegend=False)
+    return fig
+
+
+def approximate(fig, bounds):
+    """Copy of `fig` marked as an estimate; `bounds` is the ± of every answer.
+
+    Bars get error bars, pie segments the bound in their label, and the title
+    says the chart is approximate.
+    """
+    fig = go.Figure(fig)
+    trace = fig.data[0]
+    if trace.type == 'pie':
+        values = [round(float(bounds.get(label, 0))) for label in trace.labels]
+        trace.update(customdata=values, texttemplate='%{label}<br>%{percent}<br>± %{customdata}')
+    else:
+        trace.update(error_y=dict(type='data', array=[float(bounds.get(label, 0)) for label in trace.x],
+                                  color='white', thickness=1))
+        if trace.texttemplate:
+            trace.update(texttemplate='≈%{y}')
+    fig.update_layout(title_text=f'{fig.layout.title.text} (approximate)')
+    return fig
+
+
+# -- Persistence (figures kept in server.py's disk cache)
+
+def figures_to_json(figures):
+    specs = {key: fig.to_plotly_json() for key, fig in figures.items()}
+    return json.dumps(specs, cls=PlotlyJSONEncoder).encode('utf-8')
+
+
+def figures_from_json(blob):
+    return {key: go.Figure(spec) for key, spec in json.loads(blob).items()}
+
+
+# -- Static images (low-bandwidth mode)
+
+IMAGE_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+IMAGE_BACKGROUND = '#0e1117'  # Streamlit's dark background; the charts use white text
+
+
+def images_available():
+    # Server-side rendering needs the optional kaleido package
+    return importlib.util.find_spec('kaleido') is not None
+
+
+def render_image(fig, fmt='png', width=900, height=450, background=IMAGE_BACKGROUND, font_color='white'):
+    """Render a figure with kaleido; returns PNG bytes or an SVG string.
+
+    The browser does not apply the Streamlit theme to images, so the dark
+    background and white text are baked in (the printable reports pass white
+    and black).
+    """
+    fig = go.Figure(fig)
+    fig.update_layout(paper_bgcolor=background, font_color=font_color, width=width, height=height)
+    image = fig.to_image(format=fmt, width=width, height=height)
+    if fmt == 'svg':
+        return image.decode('utf-8')
+    return quantize_png(image)
+
+
+def quantize_png(image, colors=64):
+    # Flat chart colours survive a 64 colour palette; the file shrinks ~4x
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.open(io.BytesIO(image)).convert('RGB').quantize(colors=colors).save(out, format='PNG', optimize=True)
+    return out.getvalue()
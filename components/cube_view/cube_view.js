@@ -0,0 +1,189 @@
+// Browser side of cube_view.py: filters and charts recomputed from the count
+// cubes sent once by the server, without rerunning the Streamlit script.
+(function () {
+  'use strict';
+
+  var view = null;  // payload of the current dataset version, plus the selection
+  var theme = {};
+
+  function send(type, data) {
+    window.parent.postMessage(Object.assign({isStreamlitMessage: true, type: type}, data || {}), '*');
+  }
+
+  function resize() {
+    send('streamlit:setFrameHeight', {height: document.documentElement.scrollHeight});
+  }
+
+  // Flat ids of the selected cells; cubes are C-ordered (filters..., answers)
+  function selectedCells() {
+    var cells = [0];
+    view.filters.forEach(function (filter) {
+      var next = [];
+      cells.forEach(function (cell) {
+        filter.selected.forEach(function (i) { next.push(cell * filter.options.length + i); });
+      });
+      cells = next;
+    });
+    return cells;
+  }
+
+  // Rounded to whole respondents, as on the server (weighted cubes hold fractions)
+  function sum(cube, width, cells) {
+    var out = new Array(width).fill(0);
+    cells.forEach(function (cell) {
+      for (var j = 0, base = cell * width; j < width; j++) out[j] += cube[base + j];
+    });
+    return out.map(Math.round);
+  }
+
+  function byCount(a, b) { return b[1] - a[1]; }  // Array.sort is stable
+
+  // Same steps as SurveyStore.count followed by charts.Chart.arrange
+  function arrange(chart, values) {
+    var items = chart.answers.map(function (answer, j) { return [answer, values[j]]; });
+    if (!chart.multi) {
+      items = items.filter(function (item) { return item[1] > 0; }).sort(byCount);
+    }
+    if (chart.order) {
+      var found = new Map(items);
+      return chart.order.map(function (answer) {
+        return [answer, found.has(answer) ? found.get(answer) : chart.fill];
+      });
+    }
+    return chart.sort ? items.sort(byCount) : items;
+  }
+
+  function trace(chart, items) {
+    var data = Object.assign({}, chart.figure.data[0]);
+    var labels = items.map(function (item) { return item[0]; });
+    var values = items.map(function (item) { return item[1]; });
+    if (chart.kind === 'pie') {
+      data.labels = labels;
+      data.values = values;
+      if (chart.pull_largest) {
+        var largest = Math.max.apply(null, values);
+        data.pull = values.map(function (value) { return value === largest ? 0.1 : 0; });
+      }
+    } else {
+      data.x = labels;
+      data.y = values;
+      data.marker = Object.assign({}, data.marker, {
+        color: labels.map(function (_, i) { return chart.palette[i % chart.palette.length]; })
+      });
+    }
+    return data;
+  }
+
+  function redraw() {
+    var cells = selectedCells();
+    var total = 'Selected Submissions: ' + sum(view.rows, 1, cells)[0];
+    if (view.estimates) {
+      total += ' (weighted to ' + sum(view.estimates, 1, cells)[0].toLocaleString('en-US') + ' beneficiaries)';
+    }
+    document.getElementById('total').textContent = total;
+    Object.keys(view.charts).forEach(function (key) {
+      var chart = view.charts[key];
+      if (!chart.node) return;  // not placed on the page
+      var items = arrange(chart, sum(chart.cube, chart.answers.length, cells));
+      Plotly.react(chart.node, [trace(chart, items)], chart.layout, {displaylogo: false, responsive: true});
+    });
+    resize();
+  }
+
+  function checkbox(filter, i) {
+    var label = document.createElement('label');
+    var input = document.createElement('input');
+    input.type = 'checkbox';
+    input.checked = filter.selected.indexOf(i) >= 0;
+    input.addEventListener('change', function () {
+      filter.selected = filter.options.map(function (_, j) { return j; }).filter(function (j) {
+        return j === i ? input.checked : filter.selected.indexOf(j) >= 0;
+      });
+      redraw();
+    });
+    label.appendChild(input);
+    label.appendChild(document.createTextNode(' ' + (filter.options[i] === null ? '(blank)' : filter.options[i])));
+    return label;
+  }
+
+  function buildFilters() {
+    var root = document.getElementById('filters');
+    root.innerHTML = '';
+    view.filters.forEach(function (filter) {
+      var box = document.createElement('fieldset');
+      var legend = document.createElement('legend');
+      legend.textContent = filter.label;
+      box.appendChild(legend);
+      var boxes = document.createElement('div');
+      box.appendChild(boxes);
+      var actions = document.createElement('div');
+      actions.className = 'actions';
+      [['All', true], ['None', false]].forEach(function (action) {
+        var link = document.createElement('a');
+        link.textContent = action[0];
+        link.addEventListener('click', function () {
+          filter.selected = action[1] ? filter.options.map(function (_, j) { return j; }) : [];
+          fill();
+          redraw();
+        });
+        actions.appendChild(link);
+      });
+      box.appendChild(actions);
+      root.appendChild(box);
+
+      function fill() {
+        boxes.innerHTML = '';
+        filter.options.forEach(function (_, i) { boxes.appendChild(checkbox(filter, i)); });
+      }
+      fill();
+    });
+  }
+
+  function buildPage() {
+    var page = document.getElementById('page');
+    page.innerHTML = '';
+    view.sections.forEach(function (section, n) {
+      if (n) page.appendChild(document.createElement('hr'));
+      if (section[0]) {
+        var heading = document.createElement('h3');
+        heading.textContent = section[0];
+        page.appendChild(heading);
+      }
+      section[1].forEach(function (key) {
+        var chart = view.charts[key];
+        chart.node = document.createElement('div');
+        chart.node.className = 'chart';
+        page.appendChild(chart.node);
+        // The Streamlit theme is not applied inside the iframe
+        chart.layout = Object.assign({}, chart.figure.layout, {
+          font: Object.assign({color: theme.textColor, family: theme.font}, chart.figure.layout.font)
+        });
+      });
+    });
+  }
+
+  function render(event) {
+    if (!event.data || event.data.type !== 'streamlit:render') return;
+    var args = event.data.args;
+    theme = event.data.theme || {};
+    document.body.style.background = theme.backgroundColor || '';
+    document.body.style.color = theme.textColor || '';
+    // Reruns of the script send the same payload: keep the current selection
+    if (view && view.version === args.payload.version) return resize();
+    view = args.payload;
+    view.sections = args.sections;
+    view.filters.forEach(function (filter) {
+      filter.label = args.labels[filter.name] || filter.name;
+      filter.selected = filter.options.map(function (_, i) { return i; });
+    });
+    buildFilters();
+    buildPage();
+    redraw();
+  }
+
+  window.addEventListener('message', render);
+  window.addEventListener('load', function () {
+    send('streamlit:componentReady', {apiVersion: 1});
+  });
+  window.addEventListener('resize', resize);
+})();
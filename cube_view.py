@@ -0,0 +1,119 @@
+"""Browser-side filtering of the dashboard.
+
+The count cubes of the charted questions go to the browser once per dataset
+version; the component in ``components/cube_view`` draws the filters and the
+charts and recomputes them there, so changing a filter does not rerun the
+script.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+from survey import QUESTIONS
+
+logger = logging.getLogger(__name__)
+
+FRONTEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'components', 'cube_view')
+PLOTLY_JS = 'plotly.min.js'
+
+_component = None
+_component_lock = threading.Lock()
+
+
+def _install(source, directory, name):
+    # Copied under a temporary name and renamed: readers never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, os.path.join(directory, name))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _frontend():
+    """Directory the component is served from, with plotly.js next to it.
+
+    plotly.js is served with the component, so the browser caches it between
+    visits; it is copied from the installed plotly to match the figures. When
+    the source tree is read-only, the component is served from a copy in the
+    temporary directory instead.
+    """
+    import plotly
+
+    source = os.path.join(os.path.dirname(plotly.__file__), 'package_data', PLOTLY_JS)
+    if os.path.exists(os.path.join(FRONTEND, PLOTLY_JS)):
+        return FRONTEND
+    try:
+        _install(source, FRONTEND, PLOTLY_JS)
+        return FRONTEND
+    except OSError as error:
+        copy = os.path.join(tempfile.gettempdir(), f'cube_view-{plotly.__version__}')
+        logger.warning('Cannot write %s (%s); serving the browser-side filtering from %s', FRONTEND, error, copy)
+        os.makedirs(copy, exist_ok=True)
+        for name in os.listdir(FRONTEND):
+            if name != PLOTLY_JS and os.path.isfile(os.path.join(FRONTEND, name)):
+                _install(os.path.join(FRONTEND, name), copy, name)  # Always the files of this code
+        if not os.path.exists(os.path.join(copy, PLOTLY_JS)):
+            _install(source, copy, PLOTLY_JS)
+        return copy
+
+
+def _get_component():
+    # Declared on first use: only sessions that switch the mode on pay for it
+    global _component
+    with _component_lock:
+        if _component is None:
+            import streamlit.components.v1 as components
+
+            _component = components.declare_component('cube_view', path=_frontend())
+        return _component
+
+
+def _values(cube):
+    # Weighted cubes hold fractions; two decimals are plenty for whole counts
+    cube = np.asarray(cube).ravel()
+    return (cube.round(2) if cube.dtype.kind == 'f' else cube).tolist()
+
+
+def payload(version, data, figures):
+    """Everything the browser needs, built once per dataset version.
+
+    `figures` are the charts of the default selection: the browser keeps their
+    layout and trace styling and only replaces the counts.
+    """
+    from charts import CHARTS
+
+    charts = {}
+    for key, chart in CHARTS.items():
+        charts[key] = dict(
+            chart.spec(),
+            figure=json.loads(figures[key].to_json()),
+            answers=data.answers[key],
+            multi=QUESTIONS[key].multi,
+            cube=_values(data.cubes[key]),
+        )
+    return {
+        'version': version,
+        'filters': [{'name': name, 'options': options} for name, options in data.filters.items()],
+        'rows': _values(data.cell_sizes(weighted=False)),  # Submissions per cell
+        # Weighted stores: the beneficiaries they are weighted to per cell
+        'estimates': None if data.weights is None else _values(data.cell_sizes()),
+        'charts': charts,
+    }
+
+
+def cube_view(payload, sections, labels=None, key=None):
+    """Render the filters and charts of `payload` in the browser.
+
+    `sections` lists (subheader or None, [chart keys]) in page order and
+    `labels` names the filters.
+    """
+    _get_component()(payload=payload, sections=sections, labels=labels or {}, key=key, default=None)
@@ -0,0 +1,201 @@
+import hashlib
+import io
+import logging
+import os
+import pickle
+import threading
+import time
+import urllib.error
+import urllib.request
+from email.utils import formatdate
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def parse_csv(body):
+    # Same format load_data() always used: semicolon separated export
+    return pd.read_csv(io.BytesIO(body), sep=';')
+
+
+def content_version(body):
+    return hashlib.sha1(body).hexdigest()[:12]
+
+
+class Snapshot:
+    """One fully parsed copy of the survey export plus its validators."""
+
+    def __init__(self, data, version, etag=None, last_modified=None):
+        self.data = data
+        self.version = version
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.time()
+
+
+class DataSource:
+    """Serves the current snapshot of `data_link` and revalidates it in the background.
+
+    Readers always get the snapshot that is already in memory. A refresh sends
+    a conditional request (If-None-Match / If-Modified-Since), and only when the
+    server returns a changed body is it parsed and prepared; the new snapshot
+    replaces the old one in a single assignment once it is complete.
+
+    With a `store` (disk_cache.DiskCache) the parsed snapshot is kept on disk;
+    after a restart it is served at once and revalidated in the background.
+    `schema` names the layout of what `parse` returns in the stored key, and
+    `validate` rejects a restored value (then the source is loaded afresh).
+    """
+
+    def __init__(self, url, interval=300, parse=parse_csv, timeout=30, store=None, schema='', validate=None):
+        self.url = url
+        self.interval = interval
+        self.parse = parse
+        self.timeout = timeout
+        self.store = store
+        self.schema = schema
+        self.validate = validate
+        self._snapshot = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -- fetching
+
+    def _is_remote(self):
+        return self.url.startswith(('http://', 'https://'))
+
+    def _fetch_remote(self, etag, last_modified):
+        request = urllib.request.Request(self.url)
+        if etag:
+            request.add_header('If-None-Match', etag)
+        if last_modified:
+            request.add_header('If-Modified-Since', last_modified)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read(), response.headers.get('ETag'), response.headers.get('Last-Modified')
+        except urllib.error.HTTPError as err:
+            if err.code == 304:
+                return None, etag, last_modified
+            raise
+
+    def _fetch_local(self, last_modified):
+        # Local files (development, tests) are revalidated on their mtime
+        stamp = formatdate(os.path.getmtime(self.url), usegmt=True)
+        if last_modified is not None and stamp == last_modified:
+            return None, None, last_modified
+        with open(self.url, 'rb') as fh:
+            return fh.read(), None, stamp
+
+    def fetch(self, etag=None, last_modified=None):
+        """Return (body, etag, last_modified); body is None when unchanged."""
+        if self._is_remote():
+            return self._fetch_remote(etag, last_modified)
+        return self._fetch_local(last_modified)
+
+    # -- snapshots
+
+    def peek(self):
+        """The snapshot being served, or None before the first load; never loads."""
+        return self._snapshot
+
+    def current(self):
+        """Return the snapshot being served, loading it on first use only."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            if self._restore():
+                threading.Thread(target=self._revalidate, name='data-source-revalidate', daemon=True).start()
+            else:
+                self.refresh()
+            snapshot = self._snapshot
+        return snapshot
+
+    def refresh(self):
+        """Revalidate once; returns True when a new snapshot was swapped in."""
+        with self._refresh_lock:
+            old = self._snapshot
+            body, etag, last_modified = self.fetch(
+                old.etag if old else None,
+                old.last_modified if old else None,
+            )
+            if body is None:
+                logger.debug('data_link not modified')
+                old.fetched_at = time.time()
+                return False
+            version = content_version(body)
+            if old is not None and old.version == version:
+                # Validators changed but the content did not
+                old.etag, old.last_modified = etag, last_modified
+                old.fetched_at = time.time()
+                return False
+            data = self.parse(body)
+            self._snapshot = Snapshot(data, version, etag, last_modified)
+            logger.info('data_link snapshot %s loaded (%d rows)', version, len(data))
+            self._persist(self._snapshot)
+            return True
+
+    # -- persistence
+
+    def _store_key(self):
+        return f'snapshot:{self.schema}:{self.url}'
+
+    def _restore(self):
+        """Serve the snapshot kept in the store, if any; returns True if one was loaded."""
+        if self.store is None:
+            return False
+        with self._refresh_lock:
+            if self._snapshot is not None:
+                return True
+            try:
+                blob = self.store.get(self._store_key())
+                if blob is None:
+                    return False
+                version, etag, last_modified, data = pickle.loads(blob)
+            except Exception:
+                logger.exception('Could not restore the stored data_link snapshot')
+                return False
+            if self.validate is not None and not self.validate(data):
+                logger.warning('Stored data_link snapshot %s was written by other code; loading it afresh', version)
+                return False
+            self._snapshot = Snapshot(data, version, etag, last_modified)
+            logger.info('data_link snapshot %s restored from %s', version, self.store.path)
+            return True
+
+    def _persist(self, snapshot):
+        if self.store is None:
+            return
+        try:
+            blob = pickle.dumps(
+                (snapshot.version, snapshot.etag, snapshot.last_modified, snapshot.data),
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+            self.store.put(self._store_key(), blob, snapshot.version)
+        except Exception:
+            logger.exception('Could not store the data_link snapshot')
+
+    # -- background revalidation
+
+    def _revalidate(self):
+        try:
+            self.refresh()
+        except Exception:
+            # Keep serving the stale snapshot; try again next interval
+            logger.exception('Revalidating data_link failed')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._revalidate()
+
+    def start(self):
+        if self.interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='data-source-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
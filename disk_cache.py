@@ -0,0 +1,84 @@
+"""Persistent cache in a local SQLite file, shared by workers and restarts.
+
+Values are bytes stored under a string key together with the dataset version
+they were computed from. The file is kept under `max_bytes` by dropping the
+least recently used entries.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    version TEXT,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+'''
+
+
+class DiskCache:
+
+    def __init__(self, path, max_bytes=512 * 2 ** 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        # WAL lets the workers of other processes read while one writes
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+            return row[0]
+
+    def put(self, key, value, version=None):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (key, version, value, size, accessed) VALUES (?, ?, ?, ?, ?)',
+                (key, version, sqlite3.Binary(value), len(value), time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Down to 90% of the budget, so that every put does not evict
+        excess = total - int(self.max_bytes * 0.9)
+        evicted = 0
+        for key, size in self._db.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall():
+            if evicted >= excess:
+                break
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            evicted += size
+
+    def clear(self, version=None):
+        """Drop every entry, or the entries computed from `version`."""
+        with self._lock:
+            if version is None:
+                self._db.execute('DELETE FROM entries')
+            else:
+                self._db.execute('DELETE FROM entries WHERE version = ?', (version,))
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'entries': entries, 'bytes': size, 'hits': self.hits, 'misses': self.misses}
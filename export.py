@@ -0,0 +1,132 @@
+"""Downloads of the current selection: chart tables and respondent rows.
+
+Respondent rows are materialized a chunk at a time from the row numbers of the
+selection (SurveyStore.rows) and written straight into the output, so a full
+filtered copy of the data never exists in memory.
+"""
+import importlib.util
+import io
+
+import numpy as np
+
+from survey import QUESTIONS
+
+CHUNK_ROWS = 5000
+SEP = ';'  # Same layout as the survey export, so a download loads back in
+
+# format: (mime type, file extension)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def formats():
+    # Excel files need the optional openpyxl package
+    return [fmt for fmt in FORMATS if fmt != 'xlsx' or importlib.util.find_spec('openpyxl') is not None]
+
+
+def aggregate_tables(data, selection):
+    """(chart key, table) of every chart: its counts, arranged as the chart shows them."""
+    from charts import CHARTS
+
+    counts = data.counts(selection)
+    for key, chart in CHARTS.items():
+        arranged = chart.arrange(counts[key]).astype('Int64')  # Ratings may be missing
+        table = arranged.rename_axis('answer').reset_index()
+        table.insert(0, 'chart', key)
+        table.insert(1, 'question', QUESTIONS[key].column)
+        yield key, table
+
+
+def _aggregate_schema():
+    import pyarrow as pa
+
+    # Fixed: the table of a chart without answers has no values to infer types from
+    return pa.schema([('chart', pa.string()), ('question', pa.string()), ('answer', pa.string()),
+                      ('count', pa.int64())])
+
+
+def row_chunks(data, rows, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(rows), chunk_rows):
+        yield data.frame(rows[start:start + chunk_rows])
+
+
+def export_aggregates(data, selection, fmt):
+    """All chart tables in one file: one long table, or a sheet per chart."""
+    tables = aggregate_tables(data, selection)
+    if fmt == 'xlsx':
+        return _write_xlsx((key, [table]) for key, table in tables)
+    if fmt == 'parquet':
+        return _write_parquet((table for _, table in tables), _aggregate_schema())
+    return _write_csv(table for _, table in tables)
+
+
+def export_rows(data, selection, fmt, chunk_rows=CHUNK_ROWS):
+    """The respondent rows of the selection, in file order."""
+    chunks = row_chunks(data, data.rows(selection), chunk_rows)
+    if fmt == 'xlsx':
+        return _write_xlsx([('respondents', chunks)])
+    if fmt == 'parquet':
+        return _write_parquet(chunks, _schema(data))
+    return _write_csv(chunks, columns=list(data.columns))
+
+
+def _write_csv(chunks, columns=None):
+    out = io.BytesIO()
+    header = True
+    for chunk in chunks:
+        out.write(chunk.to_csv(sep=SEP, index=False, header=header).encode('utf-8'))
+        header = False
+    if header and columns:
+        # Nothing selected: still write the header line
+        out.write((SEP.join(columns) + '\n').encode('utf-8'))
+    return out.getvalue()
+
+
+def _schema(data):
+    import pyarrow as pa
+
+    # Fixed up front: a chunk where a column is all missing must not change its type
+    return pa.schema([
+        (name, pa.string() if name in data.categories else pa.from_numpy_dtype(np.asarray(values).dtype))
+        for name, values in data.columns.items()
+    ])
+
+
+def _write_parquet(chunks, schema=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out = io.BytesIO()
+    writer = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(out, table.schema)
+        writer.write_table(table)  # One row group per chunk
+    if writer is None:
+        writer = pq.ParquetWriter(out, schema)
+    writer.close()
+    return out.getvalue()
+
+
+def _write_xlsx(sheets):
+    # Write-only workbook: rows are streamed into the file, not kept as cells
+    from openpyxl import Workbook
+
+    book = Workbook(write_only=True)
+    for title, chunks in sheets:
+        sheet = book.create_sheet(title[:31])
+        header = True
+        for chunk in chunks:
+            if header:
+                sheet.append(list(chunk.columns))
+                header = False
+            for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False):
+                sheet.append(list(row))
+    out = io.BytesIO()
+    book.save(out)
+    return out.getvalue()
+
@@ -0,0 +1,217 @@
+"""Headless batch reports: the charts of the page for every district (or segment).
+
+Each report is a static HTML page with every chart of app.py (same chart
+definitions and layout) for one combination of filter values, laid out to
+print to PDF one chart per block. The charts are interactive plotly figures
+sharing one plotly.min.js next to the reports, or with --images inline SVG
+rendered by kaleido, which needs no script at all.
+
+The dataset is loaded once, or memory-mapped from a bundle directory written
+by ``python snapshot.py``, before the worker processes are forked, so every
+worker reads the same pages of it. The workers build and write one report at
+a time; index.html lists them.
+
+    python reports.py export.csv --out reports
+    python reports.py snapshots --by gender district --workers 4 --images
+"""
+import argparse
+import html
+import itertools
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from data_source import DataSource, content_version
+from snapshot import build_store, latest_version, load_bundle
+from survey import FILTERS, QUESTIONS, SECTIONS
+from url_state import param
+
+logger = logging.getLogger(__name__)
+
+PLOTLY_JS = 'plotly.min.js'
+# The figures are styled for the dark Streamlit page; reports are white
+PRINT_BACKGROUND = 'white'
+PRINT_FONT = 'black'
+# Print layout: A4 pages, a chart never split across two of them
+STYLE = """
+body { font-family: sans-serif; max-width: 960px; margin: 2em auto; color: #222; }
+header p, footer { color: #666; }
+.chart { break-inside: avoid; page-break-inside: avoid; margin: 1em 0; }
+.chart svg { max-width: 100%; height: auto; }
+hr { border: 0; border-top: 1px solid #ccc; }
+@page { size: A4; margin: 15mm; }
+@media print { hr { break-after: avoid; } }
+"""
+
+# The data, output directory and options of the running generate(); workers
+# forked from it inherit this instead of being sent the dataset
+_job = None
+
+
+def slug(value):
+    return re.sub(r'[^a-z0-9]+', '-', str(value).lower()).strip('-') or 'blank'
+
+
+def targets(data, by):
+    """(name, title, selection) of every report: one per combination of values of the filters `by`.
+
+    Combinations without respondents are left out.
+    """
+    found = []
+    sizes = data.cell_sizes(weighted=False)
+    for values in itertools.product(*[[v for v in data.options(name) if v is not None] for name in by]):
+        selection = data.default_selection()
+        selection.update({name: [value] for name, value in zip(by, values)})
+        if not sizes[np.ix_(*data.selection_index(selection))].sum():
+            continue
+        name = '_'.join(f'{param(filter_name)}-{slug(value)}' for filter_name, value in zip(by, values))
+        title = ', '.join(f'{param(filter_name).capitalize()}: {value}' for filter_name, value in zip(by, values))
+        found.append((name, title, selection))
+    return found
+
+
+def respondents_text(submissions, beneficiaries=None):
+    """'N submissions', with the beneficiaries they are weighted to if any."""
+    text = f'{submissions:,.0f} submissions'
+    if beneficiaries is not None:
+        text += f', weighted to {beneficiaries:,.0f} beneficiaries'
+    return text
+
+
+def report_html(title, respondents, figures, version, images=False):
+    """The report page of `figures` (key -> figure of charts.build_figures).
+
+    `respondents` is the respondents_text() of the report's selection.
+    """
+    import plotly.graph_objects as go
+
+    from charts import render_image
+
+    body = []
+    for n, (subheader, keys) in enumerate(SECTIONS):
+        if n:
+            body.append('<hr>')
+        if subheader:
+            body.append(f'<h2>{html.escape(subheader)}</h2>')
+        for key in keys:
+            if images:
+                chart = render_image(figures[key], 'svg', background=PRINT_BACKGROUND, font_color=PRINT_FONT)
+            else:
+                fig = go.Figure(figures[key]).update_layout(font_color=PRINT_FONT)
+                chart = fig.to_html(full_html=False, include_plotlyjs=False,
+                                    config={'displayModeBar': False, 'responsive': True})
+            body.append(f'<div class="chart" id="{key}">{chart}</div>')
+    script = '' if images else f'<script src="{PLOTLY_JS}"></script>'
+    generated = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
+    return (f'<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">'
+            f'<title>CFRM Research: {html.escape(title)}</title><style>{STYLE}</style>{script}</head>\n'
+            f'<body><header><h1>CFRM Research: {html.escape(title)}</h1>'
+            f'<p>{html.escape(respondents)} &middot; data version {html.escape(version)}</p></header>\n'
+            + '\n'.join(body)
+            + f'\n<footer><p>Generated {generated}</p></footer></body></html>\n')
+
+
+def write_report(target):
+    """Build and write one report of the running job; returns (name, title, respondents text, seconds)."""
+    from charts import build_figures
+
+    data, out, version, images = _job
+    name, title, selection = target
+    started = time.perf_counter()
+    index = np.ix_(*data.selection_index(selection))
+    respondents = respondents_text(data.cell_sizes(weighted=False)[index].sum(),
+                                   None if data.weights is None else data.cell_sizes()[index].sum())
+    page = report_html(title, respondents, build_figures(data, selection), version, images)
+    with open(os.path.join(out, f'{name}.html'), 'w', encoding='utf-8') as fh:
+        fh.write(page)
+    return name, title, respondents, time.perf_counter() - started
+
+
+def index_html(written, version):
+    rows = '\n'.join(f'<li><a href="{name}.html">{html.escape(title)}</a> ({html.escape(respondents)})</li>'
+                     for name, title, respondents, _ in written)
+    return (f'<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8"><title>CFRM Research reports</title>'
+            f'<style>{STYLE}</style></head>\n<body><h1>CFRM Research reports</h1>'
+            f'<p>Data version {html.escape(version)}</p>\n<ul>\n{rows}\n</ul></body></html>\n')
+
+
+def generate(data, out, by, version, workers=None, images=False):
+    """Write a report per target(data, by) and the index under `out`; returns what write_report returned.
+
+    `workers` processes share `data` by forking (None: one per core, 0: none).
+    """
+    global _job
+    os.makedirs(out, exist_ok=True)
+    if not images:
+        from plotly.offline import get_plotlyjs
+
+        with open(os.path.join(out, PLOTLY_JS), 'w', encoding='utf-8') as fh:
+            fh.write(get_plotlyjs())
+    reports = targets(data, by)
+    workers = min((os.cpu_count() or 1) if workers is None else workers, len(reports))
+    _job = (data, out, version, images)
+    try:
+        if workers > 0:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                written = list(pool.map(write_report, reports, chunksize=-(-len(reports) // (4 * workers))))
+        else:
+            written = [write_report(target) for target in reports]
+    finally:
+        _job = None
+    with open(os.path.join(out, 'index.html'), 'w', encoding='utf-8') as fh:
+        fh.write(index_html(written, version))
+    return written
+
+
+def load(source):
+    """(SurveyStore, version) of a bundle directory or of a CSV path/URL."""
+    if os.path.isdir(source):
+        version = latest_version(source)
+        if version is None:
+            raise FileNotFoundError(f'No snapshot published in {source}')
+        return load_bundle(os.path.join(source, version)), version
+    body, _, _ = DataSource(source, interval=0).fetch()
+    return build_store(body), content_version(body)
+
+
+def main(argv=None):
+    names = {param(name): name for name in FILTERS}
+    parser = argparse.ArgumentParser(description='Write the chart reports of every district (or segment).')
+    parser.add_argument('source', help='path or URL of the ;-separated survey CSV, or a bundle directory')
+    parser.add_argument('--out', default='reports', help='report directory (default: %(default)s)')
+    parser.add_argument('--by', nargs='+', default=['district'], choices=list(names),
+                        help='one report per combination of these filters (default: district)')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per core, 0 for none)')
+    parser.add_argument('--images', action='store_true', help='inline SVG charts instead of interactive ones')
+    parser.add_argument('--weights', help='weights table (weights.py) to weight every chart with')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.images:
+        from charts import images_available
+
+        if not images_available():
+            parser.error('--images needs the kaleido package')
+
+    started = time.perf_counter()
+    data, version = load(args.source)
+    if args.weights:
+        import weights
+
+        table = weights.load(args.weights)
+        data = data.weighted(weights.row_weights(data, table))
+        version = f'{version}-w{weights.fingerprint(table)}'
+    loaded = time.perf_counter()
+    written = generate(data, args.out, [names[name] for name in args.by], version, args.workers, args.images)
+    finished = time.perf_counter()
+    logger.info('Wrote %d reports of %d charts to %s in %.2fs (data %.2fs, reports %.2fs)',
+                len(written), len(QUESTIONS), args.out, finished - started, loaded - started, finished - loaded)
+
+
+if __name__ == '__main__':
+    main()
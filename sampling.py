@@ -0,0 +1,121 @@
+"""Chart counts estimated from a stratified sample, with error bounds.
+
+The sample draws the same fraction of the rows of every (gender, district)
+stratum, and at least `min_rows` of each. Its answers are summed into count
+cubes shaped like SurveyStore's, so an estimate for any sidebar selection is a
+sum over the selected cells, each stratum scaled up by its population over its
+sample size. The bound is the 95% interval of the stratified estimator of a
+total (sampling without replacement). From a weighted store each sampled
+answer counts with its row's weight.
+"""
+import numpy as np
+import pandas as pd
+
+from snapshot import answer_counts
+from survey import DISTRICT, GENDER, QUESTIONS
+
+STRATA = [GENDER, DISTRICT]
+Z = 1.96  # 95% two-sided
+
+
+def stratified_rows(data, fraction=0.05, min_rows=30, seed=0):
+    """Sorted row numbers of a stratified sample of `data`."""
+    rng = np.random.default_rng(seed)
+    axes = [list(data.filters).index(name) for name in STRATA]
+    sizes = [data.shape[axis] for axis in axes]
+    dims = np.unravel_index(data.cells, data.shape)
+    strata = np.ravel_multi_index([dims[axis] for axis in axes], sizes)
+    order = np.argsort(strata, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(strata, minlength=int(np.prod(sizes))))])
+    parts = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        size = stop - start
+        if size:
+            n = min(size, max(min_rows, int(np.ceil(fraction * size))))
+            parts.append(rng.choice(order[start:stop], n, replace=False))
+    return np.sort(np.concatenate(parts)) if parts else np.zeros(0, np.int64)
+
+
+class SampleEstimate:
+    """Estimated counts for any selection, from a stratified sample of a SurveyStore."""
+
+    def __init__(self, data, rows):
+        self.rows = rows
+        self.answers = data.answers
+        self.filters = data.filters
+        self._select = data.selection_index
+        axes = [list(data.filters).index(name) for name in STRATA]
+        self._others = tuple(axis for axis in range(len(data.shape)) if axis not in axes)
+
+        # Population and sample size per cell, then per stratum
+        population = np.diff(data.offsets).reshape(data.shape)
+        sampled = np.bincount(data.cells[rows], minlength=population.size).reshape(data.shape)
+        self._population = population.sum(axis=self._others)
+        self._sampled = sampled.sum(axis=self._others)
+
+        # Sample cubes: answer sums and sums of squares per cell
+        cells = data.cells[rows].astype(np.int64)
+        weights = None if data.weights is None else data.weights[rows]
+        self.cubes, self.squares = {}, {}
+        for key, question in QUESTIONS.items():
+            k = len(data.answers[key])
+            if question.multi:
+                values = np.asarray(data.multi[key][rows], dtype=np.float64)
+                if weights is not None:
+                    values = values * weights[:, None]
+                sums = np.column_stack([np.bincount(cells, weights=values[:, j], minlength=population.size)
+                                        for j in range(k)])
+                squares = np.column_stack([np.bincount(cells, weights=values[:, j] ** 2, minlength=population.size)
+                                           for j in range(k)])
+            else:
+                codes = pd.Index(data.answers[key]).get_indexer(data.column(question.column, rows))
+                valid = codes >= 0
+                flat = cells[valid] * k + codes[valid]
+                if weights is None:
+                    sums = np.bincount(flat, minlength=population.size * k).reshape(-1, k)
+                    squares = sums  # Indicators: y ** 2 == y
+                else:
+                    w = weights[valid]
+                    sums = np.bincount(flat, weights=w, minlength=population.size * k).reshape(-1, k)
+                    squares = np.bincount(flat, weights=w ** 2, minlength=population.size * k).reshape(-1, k)
+            self.cubes[key] = sums.reshape(data.shape + (k,))
+            self.squares[key] = squares.reshape(data.shape + (k,))
+
+    @classmethod
+    def build(cls, data, fraction=0.05, min_rows=30, seed=0):
+        return cls(data, stratified_rows(data, fraction, min_rows, seed))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def estimate(self, key, selection):
+        """(estimated totals, 95% bounds) per answer of question `key`, in answers order."""
+        index = self._select(selection)
+        # Sum over the selected values of the other filters; strata stay apart
+        sums = self.cubes[key][np.ix_(*index)].sum(axis=self._others)
+        squares = self.squares[key][np.ix_(*index)].sum(axis=self._others)
+        strata = np.ix_(*[index[axis] for axis in range(len(index)) if axis not in self._others])
+        population = self._population[strata][..., None].astype(np.float64)
+        n = self._sampled[strata][..., None].astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            totals = np.where(n > 0, population / n * sums, 0.0)
+            variance = np.where(n > 1, (squares - sums ** 2 / n) / (n - 1), 0.0)
+            variance = np.where(n > 0, population ** 2 * (1 - n / population) * variance / n, 0.0)
+        axes = tuple(range(totals.ndim - 1))
+        return totals.sum(axis=axes), Z * np.sqrt(np.clip(variance, 0, None).sum(axis=axes))
+
+    def count(self, key, selection):
+        """Estimated counts, rounded and arranged like SurveyStore.count."""
+        totals, _ = self.estimate(key, selection)
+        return answer_counts(key, self.answers[key], np.rint(totals).astype(np.int64))
+
+    def counts(self, selection):
+        return {key: self.count(key, selection) for key in QUESTIONS}
+
+    def bounds(self, selection):
+        """{key: Series of the ± bound of every answer}."""
+        found = {}
+        for key in QUESTIONS:
+            _, bound = self.estimate(key, selection)
+            found[key] = pd.Series(bound, index=self.answers[key])
+        return found
@@ -0,0 +1,481 @@
+"""Process-wide state shared by every session of the dashboard.
+
+Start the dashboard with ``python server.py [streamlit run options]`` instead
+of ``streamlit run app.py`` to load the data and build the default view before
+the first visitor arrives.
+"""
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import streamlit as st
+
+from cache import GOVERNOR, LRUCache, sizeof
+from data_source import DataSource, Snapshot
+from disk_cache import DiskCache
+from snapshot import FORMAT, STORE_SCHEMA, BundleSource, build_store, is_current
+from url_state import canonical, state_hash
+
+logger = logging.getLogger(__name__)
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+# SQLite file of the persistent cache, unless the secrets set cache_path
+CACHE_PATH = os.path.join(os.path.dirname(APP), '.cache', 'dashboard.sqlite')
+# Bumped with every change to the figures or images charts.py builds
+FIGURE_SCHEMA = 1
+# Part of every disk cache key: entries written by other code are not read
+DISK_SCHEMA = f'{FORMAT}.{STORE_SCHEMA}.{FIGURE_SCHEMA}'
+
+# Caches are keyed by state_key(): everyone opening the same link is served
+# the same entries. Figures and images are also kept in the disk cache, which
+# outlives the process (get_disk_cache).
+
+# All of them count against one memory budget (cache.GOVERNOR, cache_budget_mb
+# in the secrets), together with the dataset being served.
+
+# Figures of the most recently viewed selections, shared by all sessions
+figure_cache = LRUCache(max_entries=64, name='figures')
+# Rendered images of single charts for the low-bandwidth mode
+image_cache = LRUCache(max_entries=64 * 26, name='images')
+# Count cubes and default figures for browser-side filtering, per version
+payload_cache = LRUCache(max_entries=4, name='browser payloads')
+# Downloads of recent selections; repeated downloads are served from here
+export_cache = LRUCache(max_entries=16, name='downloads')
+# Sorted row numbers behind one answer of a chart, for the respondent explorer
+drill_cache = LRUCache(max_entries=32, name='explorer rows')
+# The query backend over the rows, when the secrets choose one other than the
+# cubes; with weights, one for the unweighted and one for the weighted rows
+backend_cache = LRUCache(max_entries=2, name='query backend')
+# Stratified samples of the approximate mode, per version
+sample_cache = LRUCache(max_entries=2, name='samples')
+# Weighted copies of the snapshot (weights_path in the secrets); their size
+# includes the rows they share with the snapshot, an overestimate
+weighted_cache = LRUCache(max_entries=1, name='weighted snapshots')
+# Answer vocabulary drift of each version (vocabulary.py), for the admin panel
+vocabulary_cache = LRUCache(max_entries=4, name='vocabulary reports')
+
+# Approximate mode (approximate = true in the secrets): views whose exact
+# figures take longer than this are first shown estimated from a sample
+APPROXIMATE_AFTER = 0.3
+# Exact figures being computed in the background, by state_key; views waiting
+# beyond the last few are dropped, their sessions have moved on
+MAX_QUEUED = 8
+_refiner = ThreadPoolExecutor(2, thread_name_prefix='refine')
+_refining = OrderedDict()
+_refining_lock = threading.Lock()
+
+_source = None
+_source_lock = threading.Lock()
+_pool = None
+_pool_loaded = False
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_disk = None
+_disk_loaded = False
+_disk_lock = threading.Lock()
+_weights = None  # ((path, mtime), table, fingerprint)
+_weights_lock = threading.Lock()
+
+
+def get_disk_cache():
+    """The persistent DiskCache, or None when the secrets set cache_path = ""."""
+    global _disk, _disk_loaded
+    with _disk_lock:
+        if not _disk_loaded:
+            path = st.secrets.get('cache_path', CACHE_PATH)
+            if path:
+                _disk = DiskCache(path, max_bytes=int(st.secrets.get('cache_max_mb', 512)) * 2 ** 20)
+            _disk_loaded = True
+        return _disk
+
+
+def persistent(key, version, compute, dumps, loads):
+    """compute(), or its stored result from an earlier run of any worker."""
+    disk = get_disk_cache()
+    if disk is None:
+        return compute()
+    name = ':'.join(str(part) for part in (DISK_SCHEMA,) + tuple(key))
+    blob = disk.get(name)
+    if blob is not None:
+        try:
+            return loads(blob)
+        except Exception:
+            logger.exception('Dropping unreadable cache entry %s', name)
+    value = compute()
+    try:
+        disk.put(name, dumps(value), version)
+    except sqlite3.Error:
+        # A full disk or locked file must not break the page
+        logger.exception('Could not store %s in %s', name, disk.path)
+    return value
+
+
+def get_chart_pool():
+    """Executor the charts are built on, or None to build them on the script thread.
+
+    chart_workers in the secrets sets its size (0, the default, for none);
+    chart_pool = "thread" runs the counting of the charts in parallel too,
+    which helps backends that release the GIL (duckdb). The default
+    "process" pool scales the figure building, which is pure Python.
+    """
+    global _pool, _pool_loaded, _pool_workers
+    with _pool_lock:
+        if not _pool_loaded:
+            workers = _pool_workers = int(st.secrets.get('chart_workers', 0))
+            if workers > 0:
+                if st.secrets.get('chart_pool', 'process') == 'thread':
+                    _pool = ThreadPoolExecutor(workers, thread_name_prefix='charts')
+                else:
+                    # Forked, as on Linux by default: under Streamlit __main__ is the page
+                    # script, which a spawned worker would import and run
+                    _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+            _pool_loaded = True
+        return _pool
+
+
+def _reset_chart_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None  # Not marked unloaded: a crashing pool is not started again
+    pool.shutdown(wait=False)
+
+
+def get_data_source():
+    """The DataSource of this process, created from the secrets on first use."""
+    global _source
+    with _source_lock:
+        if _source is None:
+            GOVERNOR.budget = int(st.secrets.get('cache_budget_mb', 512)) * 2 ** 20
+            GOVERNOR.pin('dataset', dataset_bytes)
+            # Seconds between background revalidations (0 disables them)
+            interval = st.secrets.get('refresh_interval', 300)
+            # Directory of bundles built by `python snapshot.py` (--watch for a
+            # loader shared by several workers); preferred over data_link
+            snapshot_dir = st.secrets.get('snapshot_dir')
+            if snapshot_dir:
+                _source = BundleSource(snapshot_dir, interval=interval)
+            else:
+                _source = DataSource(st.secrets['data_link'], interval=interval, parse=build_store,
+                                     store=get_disk_cache(), schema=DISK_SCHEMA, validate=is_current)
+            _source.start()
+        return _source
+
+
+_dataset_size = {}
+
+
+def dataset_bytes():
+    """Memory held by the snapshot being served (columns, index, cubes), measured once per version."""
+    snapshot = _source.peek() if _source is not None else None
+    if snapshot is None:
+        return 0
+    if snapshot.version not in _dataset_size:
+        _dataset_size.clear()
+        _dataset_size[snapshot.version] = sizeof(snapshot.data)
+    return _dataset_size[snapshot.version]
+
+
+def current_snapshot():
+    snapshot = get_data_source().current()
+    vocabulary_report(snapshot)  # Checked once per version, as it is loaded
+    return snapshot
+
+
+def vocabulary_report(snapshot):
+    """Answers of `snapshot` its declared vocabularies miss (vocabulary.check); logged when first made."""
+    def build():
+        from vocabulary import check, summary
+
+        report = check(snapshot.data)
+        if report['rows'].any():
+            logger.warning('Snapshot %s: answers outside the declared vocabularies: %s',
+                           snapshot.version, summary(report))
+        return report
+
+    return vocabulary_cache.get_or_set(snapshot.version, build)
+
+
+def query_backend(snapshot):
+    """What the charts and aggregate downloads count with: query_backend in the secrets (backends.py)."""
+    from backends import DEFAULT, build_backend
+
+    name = st.secrets.get('query_backend', DEFAULT)
+    if name == DEFAULT:
+        return snapshot.data
+    return backend_cache.get_or_set((snapshot.version, name), lambda: build_backend(snapshot.data, name))
+
+
+def weights_available():
+    return bool(st.secrets.get('weights_path'))
+
+
+def weights_table():
+    """(table, fingerprint) of the weights file (weights.py), read again when it changes."""
+    from weights import fingerprint, load
+
+    global _weights
+    path = st.secrets['weights_path']
+    modified = os.path.getmtime(path)
+    with _weights_lock:
+        if _weights is None or _weights[0] != (path, modified):
+            table = load(path)
+            _weights = ((path, modified), table, fingerprint(table))
+            logger.info('Weights %s loaded from %s (%d groups)', _weights[2], path, len(table))
+        return _weights[1:]
+
+
+def weighted_snapshot(snapshot):
+    """`snapshot` with every count weighted by the weights file.
+
+    Its version names the weights too, so every cache, in memory and on disk,
+    keeps weighted and unweighted views apart.
+    """
+    from weights import row_weights
+
+    table, tag = weights_table()
+    version = f'{snapshot.version}-w{tag}'
+    data = weighted_cache.get_or_set(version, lambda: snapshot.data.weighted(row_weights(snapshot.data, table)))
+    return Snapshot(data, version, snapshot.etag, snapshot.last_modified)
+
+
+def state_key(snapshot, selection, query='', compare=None):
+    """Dataset version and hash of the canonical URL state of a view."""
+    return (snapshot.version, state_hash(canonical(snapshot.data, selection, query, compare)))
+
+
+def figures(snapshot, selection, query=''):
+    """All chart figures for `selection`, built once per dataset version.
+
+    With a search `query` the answers of the matching submissions are
+    highlighted on every chart.
+    """
+    # charts pulls in plotly.express/graph_objects, which only figure building
+    # needs; importing it here keeps them out of process start
+    from charts import build_figures, figures_from_json, figures_to_json, highlight
+
+    data = snapshot.data
+
+    def stored(key, build):
+        return figure_cache.get_or_set(
+            key, lambda: persistent(('figures',) + key, snapshot.version, build, figures_to_json, figures_from_json))
+
+    base_key, key = state_key(snapshot, selection), state_key(snapshot, selection, query)
+    def build_base():
+        pool = get_chart_pool()
+        try:
+            return build_figures(query_backend(snapshot), selection, pool, _pool_workers)
+        except BrokenProcessPool:
+            logger.exception('Chart workers died; building the charts on the script thread from now on')
+            _reset_chart_pool(pool)
+            return build_figures(query_backend(snapshot), selection)
+
+    base = stored(base_key, build_base)
+    if key == base_key:
+        return base
+
+    def build():
+        matched = search(snapshot, selection, query)
+        return {name: highlight(fig, data.count_rows(name, matched)) for name, fig in base.items()}
+
+    return stored(key, build)
+
+
+def comparison_figures(snapshot, selection, name, segments, label):
+    """Every chart comparing `segments`, values of filter `name`, within `selection`.
+
+    Each chart's segments come from one pass over its count cube
+    (SurveyStore.compare); cached like figures().
+    """
+    from charts import comparison_figures as build, figures_from_json, figures_to_json
+
+    key = state_key(snapshot, selection, compare=(name, segments))
+    return figure_cache.get_or_set(key, lambda: persistent(
+        ('comparison',) + key, snapshot.version,
+        lambda: build(snapshot.data, selection, name, segments, label), figures_to_json, figures_from_json))
+
+
+def sample(snapshot):
+    """The SampleEstimate of the approximate mode; sample_fraction in the secrets sets its size."""
+    from sampling import SampleEstimate
+
+    fraction = float(st.secrets.get('sample_fraction', 0.05))
+    return sample_cache.get_or_set(snapshot.version, lambda: SampleEstimate.build(snapshot.data, fraction))
+
+
+def approximate_figures(snapshot, selection):
+    """All charts of `selection` estimated from the sample, with their error bounds."""
+    from charts import approximate, build_figures
+
+    estimate = sample(snapshot)
+
+    def build():
+        bounds = estimate.bounds(selection)
+        return {key: approximate(fig, bounds[key]) for key, fig in build_figures(estimate, selection).items()}
+
+    return figure_cache.get_or_set(state_key(snapshot, selection) + ('approximate',), build)
+
+
+def refine(snapshot, selection, query=''):
+    """Future of figures() computed in the background, shared by everyone waiting for the view."""
+    key = state_key(snapshot, selection, query)
+    with _refining_lock:
+        future = _refining.get(key)
+        if future is None or future.cancelled():
+            future = _refiner.submit(figures, snapshot, selection, query)
+            _refining[key] = future
+            future.add_done_callback(lambda done: _forget(key, done))
+        _refining.move_to_end(key)
+        queued = [(k, f) for k, f in _refining.items() if not f.running() and not f.done()]
+        for _, stale in queued[:-MAX_QUEUED]:
+            stale.cancel()
+    return future
+
+
+def _forget(key, future):
+    with _refining_lock:
+        if _refining.get(key) is future:
+            del _refining[key]
+
+
+def quick_figures(snapshot, selection, query=''):
+    """(figures, pending) for the page.
+
+    Without the approximate mode these are figures() and None. With it, views
+    whose exact figures are not ready within APPROXIMATE_AFTER get the
+    approximate_figures() (without search highlights) and the Future of the
+    exact ones.
+    """
+    if not st.secrets.get('approximate', False):
+        return figures(snapshot, selection, query), None
+    found = figure_cache.get(state_key(snapshot, selection, query))
+    if found is not None:
+        return found, None
+    pending = refine(snapshot, selection, query)
+    wait([pending], timeout=APPROXIMATE_AFTER)
+    if pending.done():
+        return pending.result(), None
+    return approximate_figures(snapshot, selection), pending
+
+
+def search(snapshot, selection, query):
+    """Rows of the selection whose free text answers match `query`."""
+    data = snapshot.data
+    return data.search(query, data.rows(selection))
+
+
+def images_available():
+    from charts import images_available
+
+    return images_available()
+
+
+def image(snapshot, selection, key, fmt='svg', query=''):
+    """One chart rendered as an image, cached per chart, selection, search and version.
+
+    SVG by default: sent over the compressed websocket it is a third of the
+    PNG, which does not compress.
+    """
+    from charts import render_image
+
+    cache_key = state_key(snapshot, selection, query) + (key, fmt)
+
+    def render():
+        return persistent(
+            ('image',) + cache_key, snapshot.version,
+            lambda: render_image(figures(snapshot, selection, query)[key], fmt),
+            lambda image: image.encode('utf-8') if fmt == 'svg' else image,
+            lambda blob: blob.decode('utf-8') if fmt == 'svg' else blob,
+        )
+
+    return image_cache.get_or_set(cache_key, render)
+
+
+def browser_payload(snapshot):
+    """What the browser-side filtering mode sends once per dataset version."""
+    from cube_view import payload
+
+    selection = snapshot.data.default_selection()
+    return payload_cache.get_or_set(
+        snapshot.version, lambda: payload(snapshot.version, snapshot.data, figures(snapshot, selection)))
+
+
+def cached_export(snapshot, selection, kind, fmt):
+    """A download already generated for this selection, or None."""
+    return export_cache.get(state_key(snapshot, selection) + (kind, fmt))
+
+
+def export(snapshot, selection, kind, fmt):
+    """Chart tables ('aggregates') or respondent rows ('rows') of the selection as file bytes."""
+    from export import export_aggregates, export_rows
+
+    if kind == 'aggregates':
+        write, data = export_aggregates, query_backend(snapshot)
+    else:
+        write, data = export_rows, snapshot.data
+    return export_cache.get_or_set(
+        state_key(snapshot, selection) + (kind, fmt), lambda: write(data, selection, fmt))
+
+
+def drill_rows(snapshot, selection, key, answer, sort, ascending=True):
+    """Row numbers of the selection that gave `answer` to chart `key`, sorted by column `sort`."""
+    data = snapshot.data
+    cache_key = state_key(snapshot, selection) + (key, answer, sort, ascending)
+    return drill_cache.get_or_set(
+        cache_key, lambda: data.sort_rows(data.answer_rows(key, answer, data.rows(selection)), sort, ascending))
+
+
+def warm_up():
+    """Load the data and build the default view; returns the seconds taken."""
+    started = time.perf_counter()
+    snapshot = current_snapshot()
+    loaded = time.perf_counter()
+    selection = snapshot.data.default_selection()
+    default_figures = figures(snapshot, selection)
+    built = time.perf_counter()
+    if images_available():
+        for key in default_figures:
+            image(snapshot, selection, key)
+    finished = time.perf_counter()
+    logger.info(
+        'Warm-up finished in %.2fs (data %.2fs, default figures %.2fs, images %.2fs, snapshot %s)',
+        finished - started, loaded - started, built - loaded, finished - built, snapshot.version,
+    )
+    disk = get_disk_cache()
+    if disk is not None:
+        logger.info('Disk cache %s: %s', disk.path, disk.stats())
+    return finished - started
+
+
+def start_warm_up():
+    def run():
+        try:
+            warm_up()
+        except Exception:
+            logger.exception('Warm-up failed; the first session will load the data')
+
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    from streamlit.web import cli
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+    start_warm_up()
+    sys.argv = ['streamlit', 'run', APP] + list(sys.argv[1:] if argv is None else argv)
+    sys.exit(cli.main())
+
+
+if __name__ == '__main__':
+    # app.py imports `server`; warm that module, not this __main__ copy of it
+    import server
+    server.main()
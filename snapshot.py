@@ -0,0 +1,539 @@
+"""Prepared survey data and the offline snapshot bundles built from it.
+
+A bundle is a directory ``<root>/<version>/`` holding a manifest and plain
+``.npy`` arrays: every column of the export as compact category codes, the
+filter index and per-question count cubes. The dashboard memory-maps the bundle
+named in ``<root>/LATEST`` and swaps to a newer one when that file changes.
+
+    python snapshot.py survey.csv --out snapshots
+
+With several dashboard processes, run one loader with ``--watch`` and point
+every worker at the directory (``snapshot_dir``): the workers map the same
+read-only files, so the dataset is in memory once however many there are.
+
+    python snapshot.py https://example.org/export.csv --out snapshots --watch 300
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_source import DataSource, Snapshot, content_version, parse_csv
+from survey import FILTERS, QUESTIONS, is_free_text, normalize
+from text_index import TextIndex
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 1
+LATEST = 'LATEST'
+# Bumped with every change to the attributes of SurveyStore: stores pickled
+# by older code (the disk cache) are not restored into newer code
+STORE_SCHEMA = 2
+
+
+def _code_dtype(n):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def answer_counts(key, answers, counts):
+    """The counts of question `key` (in `answers` order) as SurveyStore.count returns them.
+
+    Weighted counts are rounded to whole respondents.
+    """
+    counts = np.asarray(counts)
+    if counts.dtype.kind == 'f':
+        counts = np.rint(counts).astype(np.int64)
+    series = pd.Series(counts, index=pd.Index(answers, name=QUESTIONS[key].column), name='count')
+    if QUESTIONS[key].multi:
+        return series
+    return series[series > 0].sort_values(ascending=False, kind='stable')
+
+
+class SurveyStore:
+    """Column store, filter index and count cubes for one dataset version.
+
+    Rows are grouped into cells, one per (gender, usage, district) combination.
+    ``cubes[key]`` holds the answer counts of each question per cell, so the
+    counts behind a chart for any sidebar selection are a sum over the selected
+    cells. ``order``/``offsets`` list the rows of each cell for row level work
+    and ``text`` indexes the free text columns.
+
+    A store from `weighted()` has the row ``weights`` and cubes of weight sums;
+    everything counted from it is a weighted estimate.
+    """
+
+    def __init__(self, columns, categories, filters, cells, order, offsets, answers, cubes, multi, text=None):
+        self.columns = columns
+        self.categories = categories
+        self.filters = filters
+        self.cells = cells
+        self.order = order
+        self.offsets = offsets
+        self.answers = answers
+        self.cubes = cubes
+        self.multi = multi
+        if text is None:
+            text = TextIndex.build(columns, categories, [name for name in categories if is_free_text(name)])
+        self.text = text
+        self.weights = None
+        self._sizes = None
+        self._lookups = {}
+        self.schema = STORE_SCHEMA
+
+    def __len__(self):
+        return len(self.cells)
+
+    @property
+    def shape(self):
+        return tuple(len(options) for options in self.filters.values())
+
+    # -- building
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build the store from an already normalized export."""
+        columns, categories = {}, {}
+        for name in df.columns:
+            col = df[name]
+            if pd.api.types.is_numeric_dtype(col.dtype):
+                columns[name] = col.to_numpy()
+            else:
+                codes, uniques = pd.factorize(col)
+                columns[name] = codes.astype(_code_dtype(len(uniques)))
+                categories[name] = uniques.tolist()
+
+        # Filter values keep the sidebar order (first appearance); a missing
+        # value gets its own trailing slot so it can still be selected
+        filters, dim_codes = {}, []
+        for name in FILTERS:
+            codes, uniques = pd.factorize(df[name])
+            options = uniques.tolist()
+            if (codes < 0).any():
+                codes = np.where(codes < 0, len(options), codes)
+                options.append(None)
+            filters[name] = options
+            dim_codes.append(codes)
+        shape = tuple(len(options) for options in filters.values())
+        n_cells = int(np.prod(shape))
+        cells = np.ravel_multi_index(dim_codes, shape).astype(np.int32) if len(df) else np.zeros(0, np.int32)
+        order = np.argsort(cells, kind='stable').astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=n_cells))]).astype(np.int64)
+
+        answers, cubes, multi = {}, {}, {}
+        for key, question in QUESTIONS.items():
+            col = df[question.column]
+            if question.multi:
+                text = col.astype('string')
+                matrix = np.column_stack([
+                    text.str.count(re.escape(option)).fillna(0).to_numpy(np.uint8)
+                    for option in question.options
+                ])
+                cube = np.column_stack([
+                    np.bincount(cells, weights=matrix[:, j], minlength=n_cells)
+                    for j in range(matrix.shape[1])
+                ]).astype(np.int64)
+                answers[key] = list(question.options)
+                multi[key] = matrix
+            else:
+                codes, uniques = pd.factorize(col)
+                k = len(uniques)
+                valid = codes >= 0
+                cube = np.bincount(cells[valid].astype(np.int64) * k + codes[valid], minlength=n_cells * k)
+                answers[key] = uniques.tolist()
+            cubes[key] = cube.reshape(shape + (len(answers[key]),))
+
+        return cls(columns, categories, filters, cells, order, offsets, answers, cubes, multi)
+
+    def weighted(self, weights):
+        """Copy of the store counting every row with its weight (float64 per row).
+
+        The cubes are rebuilt as weighted bincounts over the same cell and
+        answer codes, so weighted views cost the same cube sums as unweighted
+        ones; rows, columns and the text index are shared.
+        """
+        store = copy.copy(self)
+        store.weights = weights
+        n_cells = len(self.offsets) - 1
+        cells = self.cells.astype(np.int64)
+        store.cubes = {}
+        for key, question in QUESTIONS.items():
+            k = len(self.answers[key])
+            if question.multi:
+                matrix = self.multi[key]
+                cube = np.column_stack([np.bincount(cells, weights=matrix[:, j] * weights, minlength=n_cells)
+                                        for j in range(k)])
+            else:
+                codes = self._answer_codes(key)
+                valid = codes >= 0
+                cube = np.bincount(cells[valid] * k + codes[valid], weights=weights[valid], minlength=n_cells * k)
+            store.cubes[key] = cube.reshape(self.shape + (k,))
+        store._sizes = np.bincount(cells, weights=weights, minlength=n_cells).reshape(self.shape)
+        return store
+
+    def _answer_codes(self, key):
+        # Positions in answers[key] of every row's answer, -1 when empty
+        column = QUESTIONS[key].column
+        if column in self.categories:
+            return self.columns[column]
+        return pd.Index(self.answers[key]).get_indexer(self.columns[column])
+
+    def cell_sizes(self, weighted=True):
+        """Respondents (weighted in a weighted store) per cell, shaped like the filters.
+
+        ``weighted=False`` counts the submissions of a weighted store too.
+        """
+        if weighted and self._sizes is not None:
+            return self._sizes
+        return np.diff(self.offsets).reshape(self.shape)
+
+    # -- selections
+
+    def options(self, name):
+        return list(self.filters[name])
+
+    def selection_index(self, selection):
+        """Positions of the selected values of every filter, in filter order."""
+        index = []
+        for name, options in self.filters.items():
+            if name not in selection:
+                index.append(np.arange(len(options)))
+                continue
+            wanted = [None if pd.isna(value) else value for value in selection[name]]
+            index.append(np.array([i for i, option in enumerate(options) if option in wanted], dtype=np.intp))
+        return index
+
+    def selection_key(self, selection):
+        """Hashable, order independent form of a selection, for cache keys."""
+        return tuple(tuple(positions.tolist()) for positions in self.selection_index(selection))
+
+    def default_selection(self):
+        """Everything selected, as the sidebar starts out."""
+        return {name: list(options) for name, options in self.filters.items()}
+
+    def count(self, key, selection):
+        """Answer counts of a question for the selection, like value_counts().
+
+        Single choice questions drop empty answers and sort by count; multiple
+        choice questions keep their option order, zeros included.
+        """
+        index = self.selection_index(selection)
+        cube = self.cubes[key]
+        return answer_counts(key, self.answers[key], cube[np.ix_(*index)].sum(axis=tuple(range(len(index)))))
+
+    def counts(self, selection):
+        """count() of every question, as {key: counts}."""
+        return {key: self.count(key, selection) for key in self.cubes}
+
+    def compare(self, key, selection, name, segments):
+        """Answer counts of a question per segment, as a DataFrame (answers x segments).
+
+        Segment i is the selection with filter `name` set to its value
+        segments[i]. The cube is summed once, keeping the axis of `name`, so
+        every segment comes out of the same pass. Answers are arranged as
+        count() arranges them for all segments together.
+        """
+        index, axis = self._segment_index(selection, name, segments)
+        cube = self.cubes[key][np.ix_(*index)]
+        counts = np.rint(cube.sum(axis=tuple(a for a in range(len(index)) if a != axis))).astype(np.int64)
+        table = pd.DataFrame(counts.T, index=pd.Index(self.answers[key], name=QUESTIONS[key].column),
+                             columns=list(segments))
+        if QUESTIONS[key].multi:
+            return table
+        totals = table.sum(axis=1)
+        return table[totals > 0].iloc[np.argsort(-totals[totals > 0].to_numpy(), kind='stable')]
+
+    def segment_sizes(self, selection, name, segments):
+        """Respondents in each segment of compare()."""
+        index, axis = self._segment_index(selection, name, segments)
+        sizes = self.cell_sizes()[np.ix_(*index)].sum(axis=tuple(a for a in range(len(index)) if a != axis))
+        return pd.Series(np.rint(sizes).astype(np.int64), index=list(segments))
+
+    def _segment_index(self, selection, name, segments):
+        index = self.selection_index(selection)
+        axis = list(self.filters).index(name)
+        options = self.filters[name]
+        wanted = [None if pd.isna(value) else value for value in segments]
+        index[axis] = np.array([options.index(value) for value in wanted], dtype=np.intp)
+        return index, axis
+
+    def rows(self, selection):
+        """Row numbers matching the selection, in file order."""
+        index = self.selection_index(selection)
+        if any(len(i) == 0 for i in index):
+            return np.zeros(0, np.int64)
+        cell_ids = np.ravel_multi_index(np.meshgrid(*index, indexing='ij'), self.shape).ravel()
+        parts = [self.order[self.offsets[c]:self.offsets[c + 1]] for c in np.sort(cell_ids)]
+        return np.sort(np.concatenate(parts)).astype(np.int64)
+
+    def search(self, query, rows=None):
+        """Rows whose free text answers contain every word of `query`, within `rows`."""
+        found = self.text.search(query)
+        return found if rows is None else np.intersect1d(rows, found)
+
+    def count_rows(self, key, rows):
+        """Counts of every answer of a question among `rows`, in answers order."""
+        weights = None if self.weights is None else self.weights[rows]
+        if QUESTIONS[key].multi:
+            matrix = self.multi[key][rows]
+            counts = matrix.sum(axis=0, dtype=np.int64) if weights is None else weights @ matrix
+        else:
+            codes = self._answer_codes(key)[rows]
+            valid = codes >= 0
+            counts = np.bincount(codes[valid], weights=None if weights is None else weights[valid],
+                                 minlength=len(self.answers[key]))
+        if weights is not None:
+            counts = np.rint(counts).astype(np.int64)
+        return pd.Series(counts, index=pd.Index(self.answers[key], name=QUESTIONS[key].column), name='count')
+
+    def answer_rows(self, key, answer, rows):
+        """The rows among `rows` that gave `answer` (a position in answers[key])."""
+        if QUESTIONS[key].multi:
+            return rows[self.multi[key][rows, answer] > 0]
+        return rows[self._answer_codes(key)[rows] == answer]
+
+    def sort_rows(self, rows, name, ascending=True):
+        """`rows` ordered by column `name`; ties and missing values keep file order, missing last."""
+        values = self.columns[name][rows]
+        if name in self.categories:
+            # Rank the codes by their labels; missing (-1) ranks after all of them
+            labels = np.array([str(label) for label in self.categories[name]], dtype=object)
+            ranks = np.empty(len(labels) + 1, np.int64)
+            ranks[np.argsort(labels, kind='stable')] = np.arange(len(labels))
+            ranks[-1] = len(labels)
+            keys, missing = ranks[values], values < 0
+        else:
+            keys = values.astype(np.float64)
+            missing = np.isnan(keys)
+        if not ascending:
+            keys = -keys
+        return rows[np.lexsort((keys, missing))]
+
+    # -- materializing
+
+    def column(self, name, rows=None):
+        values = self.columns[name]
+        if rows is not None:
+            values = values[rows]
+        if name not in self.categories:
+            return pd.Series(np.asarray(values), name=name)
+        lookup = self._lookups.get(name)
+        if lookup is None:
+            # Trailing NaN so that the missing code (-1) maps to it
+            lookup = np.array(self.categories[name] + [np.nan], dtype=object)
+            self._lookups[name] = lookup
+        return pd.Series(lookup[values], name=name)
+
+    def frame(self, rows=None, columns=None):
+        """Materialize the given rows (all by default) as a DataFrame."""
+        names = list(self.columns) if columns is None else columns
+        df = pd.DataFrame({name: self.column(name, rows) for name in names})
+        if rows is not None:
+            df.index = rows
+        return df
+
+
+def is_current(data):
+    """Whether `data` is a SurveyStore of this code, not one pickled by an older version."""
+    return isinstance(data, SurveyStore) and getattr(data, 'schema', None) == STORE_SCHEMA
+
+
+def build_store(body):
+    """DataSource parser: raw CSV bytes to a prepared SurveyStore."""
+    return SurveyStore.from_frame(normalize(parse_csv(body)))
+
+
+# -- bundles
+
+def write_bundle(store, root, version, source=None):
+    """Write `store` as bundle `version` under `root`; returns its path.
+
+    The bundle is assembled in a temporary directory and renamed into place,
+    so readers never see a partial bundle.
+    """
+    final = os.path.join(root, version)
+    if os.path.isdir(final):
+        return final
+    os.makedirs(root, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.build-', dir=root)
+    try:
+        def save(name, array):
+            np.save(os.path.join(tmp, name), np.ascontiguousarray(array))
+            return name
+
+        manifest = {
+            'format': FORMAT,
+            'version': version,
+            'created': time.time(),
+            'source': source,
+            'rows': len(store),
+            'columns': [
+                {'name': name, 'file': save(f'col{i}.npy', values), 'categories': store.categories.get(name)}
+                for i, (name, values) in enumerate(store.columns.items())
+            ],
+            'filters': [{'name': name, 'options': options} for name, options in store.filters.items()],
+            'index': {
+                'cells': save('cells.npy', store.cells),
+                'order': save('order.npy', store.order),
+                'offsets': save('offsets.npy', store.offsets),
+            },
+            'questions': {
+                key: {
+                    'answers': store.answers[key],
+                    'cube': save(f'cube_{key}.npy', store.cubes[key]),
+                    'multi': save(f'multi_{key}.npy', store.multi[key]) if key in store.multi else None,
+                }
+                for key in store.cubes
+            },
+            'text': {
+                'terms': save('text_terms.npy', store.text.terms),
+                'offsets': save('text_offsets.npy', store.text.offsets),
+                'postings': save('text_postings.npy', store.text.postings),
+            },
+        }
+        with open(os.path.join(tmp, 'manifest.json'), 'w', encoding='utf-8') as fh:
+            json.dump(manifest, fh)
+        os.rename(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return final
+
+
+def publish(root, version):
+    """Point LATEST at `version` with an atomic replace."""
+    fd, tmp = tempfile.mkstemp(prefix='.latest-', dir=root)
+    with os.fdopen(fd, 'w') as fh:
+        fh.write(version)
+    os.replace(tmp, os.path.join(root, LATEST))
+
+
+def latest_version(root):
+    try:
+        with open(os.path.join(root, LATEST)) as fh:
+            return fh.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_bundle(path):
+    """Memory-map a bundle written by write_bundle()."""
+    with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as fh:
+        manifest = json.load(fh)
+    if manifest['format'] != FORMAT:
+        raise ValueError(f"Unsupported snapshot format {manifest['format']} in {path}")
+
+    def load(name):
+        return np.load(os.path.join(path, name), mmap_mode='r')
+
+    columns, categories = {}, {}
+    for column in manifest['columns']:
+        columns[column['name']] = load(column['file'])
+        if column['categories'] is not None:
+            categories[column['name']] = column['categories']
+    filters = {f['name']: f['options'] for f in manifest['filters']}
+    index = manifest['index']
+    questions = manifest['questions']
+    text = manifest.get('text')  # Rebuilt from the columns for older bundles
+    return SurveyStore(
+        columns, categories, filters,
+        load(index['cells']), load(index['order']), load(index['offsets']),
+        {key: q['answers'] for key, q in questions.items()},
+        {key: load(q['cube']) for key, q in questions.items()},
+        {key: load(q['multi']) for key, q in questions.items() if q['multi']},
+        TextIndex(load(text['terms']), load(text['offsets']), load(text['postings'])) if text else None,
+    )
+
+
+def prune(root, keep):
+    """Remove all but the `keep` newest bundles, never the published one."""
+    current = latest_version(root)
+    bundles = [
+        entry for entry in os.scandir(root)
+        if entry.is_dir() and not entry.name.startswith('.') and entry.name != current
+    ]
+    bundles.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    # Removing a mapped bundle is safe: open mappings keep their pages
+    for entry in bundles[max(keep - 1, 0):]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class BundleSource(DataSource):
+    """DataSource over a bundle directory instead of the raw export.
+
+    A refresh only reads LATEST; a new version is mapped completely before it
+    replaces the snapshot being served.
+    """
+
+    def refresh(self):
+        with self._refresh_lock:
+            version = latest_version(self.url)
+            if version is None:
+                raise FileNotFoundError(f'No snapshot published in {self.url}')
+            old = self._snapshot
+            if old is not None and old.version == version:
+                old.fetched_at = time.time()
+                return False
+            store = load_bundle(os.path.join(self.url, version))
+            self._snapshot = Snapshot(store, version)
+            logger.info('snapshot %s mapped (%d rows)', version, len(store))
+            return True
+
+
+def build(source, root, keep=3):
+    body, _, _ = DataSource(source, interval=0).fetch()
+    version = content_version(body)
+    path = write_bundle(build_store(body), root, version, source=source)
+    publish(root, version)
+    if keep:
+        prune(root, keep)
+    return version, path
+
+
+def watch(source, root, interval=300, keep=3):
+    """Revalidate `source` every `interval` seconds and publish each new version."""
+    loader = DataSource(source, interval=0, parse=build_store)
+    while True:
+        try:
+            if loader.refresh():
+                snapshot = loader.current()
+                path = write_bundle(snapshot.data, root, snapshot.version, source=source)
+                publish(root, snapshot.version)
+                if keep:
+                    prune(root, keep)
+                logger.info('Published snapshot %s at %s', snapshot.version, path)
+        except Exception:
+            # Workers keep serving the published bundle; try again next interval
+            logger.exception('Rebuilding the snapshot from %s failed', source)
+        time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build a snapshot bundle from the survey export.')
+    parser.add_argument('source', help='path or URL of the ;-separated survey CSV')
+    parser.add_argument('--out', default='snapshots', help='bundle directory (default: %(default)s)')
+    parser.add_argument('--keep', type=int, default=3, help='bundles to keep, 0 keeps all (default: %(default)s)')
+    parser.add_argument('--watch', type=float, metavar='SECONDS',
+                        help='keep running as the loader of a multi-worker deployment, revalidating every SECONDS')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.watch:
+        watch(args.source, args.out, interval=args.watch, keep=args.keep)
+        return
+    started = time.perf_counter()
+    version, path = build(args.source, args.out, keep=args.keep)
+    logger.info('Published snapshot %s at %s in %.2fs', version, path, time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    main()
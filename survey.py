@@ -0,0 +1,202 @@
+import numpy as np
+
+# Columns of the survey export the dashboard filters on
+GENDER = 'Gender of the person interviewed'
+USAGE = "How often have you interacted INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?"
+DISTRICT = 'District'
+FILTERS = [GENDER, USAGE, DISTRICT]
+
+AGE = 'Age of the person interviewed'
+AGE_GROUP = 'AgeGroup'
+AGE_LABELS = ['0-17 years', '18-59 years', '59+ years']
+
+# Long answer texts are shortened once at load time instead of on every rerun
+LABELS = {
+    "Are you informed about INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?": {
+        'Yes, I am informed about the CFRM.': 'Informed',
+        "I heard about it but don't know the details.": 'Partially Informed',
+        'No, I am not aware of the CFRM.': 'Not aware'
+    },
+    'Would you try to solve your problem on your own before submitting a complaint?': {
+        'Yes, definitely': 'Definitely',
+        "I'd consider it": 'Consider',
+        'Possibly, depending on the issue': 'Possibly',
+        'Unlikely, but not ruled out': 'Unlikely',
+        "No, I'd go straight to a complaint": 'Straight to Complaint'
+    },
+    'Did INTERSOS staff follow up with you to provide updates on the status of your case? Informing about updates, timelines, etc.': {
+        'Yes, I received regular and comprehensive updates regarding the status of my complaint.': 'Regular Updates',
+        'I received moderate communication and updates about my issue.': 'Moderate Communication',
+        'No follow-up or status updates were provided after the initial call.': 'No Follow-up',
+        "I haven't received an initial call.": 'No Initial Call'
+    },
+    "Do you think that the INTERSOS' Complaint, Feedback and Response Mechanisms (CFRM) has had a positive impact on your complaint/feedback?": {
+        'Yes, all my complaints/feedback were taken into account': 'All Addressed',
+        'Some of my complaints/feedback were taken into account': 'Some Addressed',
+        'No changes followed my complaint/feedback': 'No Changes'
+    },
+}
+
+# Option lists of the multiple choice questions (answers are ';' joined)
+potential_answers = [
+    "Difficulty seeing, even if wearing glasses",
+    "Difficulty hearing, even if using a hearing aid",
+    "Difficulty walking or climbing steps",
+    "Difficulty remembering or concentrating",
+    "None of the above"
+]
+
+info_sources = [
+    "Poster/Leaflet;",
+    "Capacity Building Activities;",
+    "Social Media;",
+    "Directly from INTERSOS staff;",
+    "Word of mouth;",
+    "Other;"
+]
+
+preferred_info_sources = [
+    "Poster/Leaflet;",
+    "Capacity Building Activities;",
+    "Social Media;",
+    "Directly from INTERSOS staff;",
+    "Word of mouth;",
+    "Email",
+    "Phone",
+    "Other;"
+]
+
+concerns = [
+    "Transparency;",
+    "Timeliness of responses;",
+    "Lack of accessibility;",
+    "Data security;",
+    "Language barriers;"
+]
+
+contact_methods = [
+    "Email;",
+    "Online form;",
+    "Feedback box;",
+    "Hotline;",
+    "In person;",
+    "Viber;",
+    "Telegram;",
+    "Whatsapp;",
+    "Facebook/Messengers;",
+    "Other;"
+]
+
+improvements1 = [
+    "Improved communication channels;",
+    "Better placement of the CFRM box;",
+    "Faster response times;",
+    "Improved transparency;",
+    "Improved communication about the case;",
+    "Other;"
+]
+
+encouragements = [
+    "Privacy;",
+    "Safety;",
+    "Good communication channels;",
+    "Effectiveness;",
+    "Responsiveness;",
+    "Other;"
+]
+
+feedback_categories = [
+    "Suggestion of improvement of INTERSOS services;",
+    "Behavior of INTERSOS staff;",
+    "Information regarding INTERSOS' services;",
+    "Complaint about the quality of INTERSOS' services;",
+    "Safety concerns regarding the current accommodation;",
+    "Other;"
+]
+
+
+class Question:
+    """A charted column; `options` is set for multiple choice questions."""
+
+    def __init__(self, column, options=None):
+        self.column = column
+        self.options = options
+
+    @property
+    def multi(self):
+        return self.options is not None
+
+
+# Every question charted by app.py, keyed like its figure (fig_<key>)
+QUESTIONS = {
+    'gender': Question(GENDER),
+    'age': Question(AGE_GROUP),
+    'pwd': Question('If you encounter any difficulties from this list, please select which', potential_answers),
+    'usage': Question(USAGE),
+    'cfrm_awareness': Question("Are you informed about INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?"),
+    'info': Question("How did you learn about INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?", info_sources),
+    'preferred_info': Question("How would you prefer to receive information about INTERSOS' Complaint, Feedback, and Response Mechanism (CFRM)?", preferred_info_sources),
+    'complaint_choice': Question('Would you try to solve your problem on your own before submitting a complaint?'),
+    'nonsens': Question('How likely are you to submit a non-sensitive complaint?'),
+    'sens_comp': Question('How likely are you to submit a sensitive complaint?'),
+    'concerns': Question("What concerns do you have about INTERSOS' Complaint, Feedback and Response Mechanisms(CFRM)?", concerns),
+    'so': Question('How did you submit your complaint/feedback?'),
+    'st': Question('What type of submission you made?'),
+    'flup': Question('Did anyone from INTERSOS reached out to you after your complaint/feedback?'),
+    'st1': Question('How would you rate the experience of submitting a complaint/feedback?'),
+    'st2': Question('How would you rate the speed of INTERSOS reaching to you after your complaint/feedback?'),
+    'st3': Question('How would you rate the experience of receiving updates on your case?'),
+    'st4': Question("How would you rate INTERSOS' attempt to implement your complaint/feedback?"),
+    'follow_up_aftercall': Question('Did INTERSOS staff follow up with you to provide updates on the status of your case? Informing about updates, timelines, etc.'),
+    'complaint_res': Question("Do you think that the INTERSOS' Complaint, Feedback and Response Mechanisms (CFRM) has had a positive impact on your complaint/feedback?"),
+    'cr_opinion': Question('Do you feel like INTERSOS did their best to implement your complaint/feedback?'),
+    'com_nonsens': Question('What would be the preferred channel of communication for a non-sensitive matter?', contact_methods),
+    'com_sens': Question('What would be the preferred channel of communication for a sensitive matter?', contact_methods),
+    'improve_cfrm': Question("What are the areas you would like to see improved in the INTERSOS' Complaint, Feedback and Response Mechanisms(CFRM)?", improvements1),
+    'improve_overall': Question('What are the most important elements of complaint system that would encourage you to use it?', encouragements),
+    'complaint_topic_now': Question('If you had to make a complaint or suggestion, what topic would it cover?', feedback_categories),
+}
+
+# Page layout of app.py and of the batch reports (reports.py): (subheader, charts) per section, separated by a rule
+SECTIONS = [
+    ('Gender & Age Disaggregation', ['gender', 'age']),
+    (None, ['pwd']),
+    (None, ['usage']),
+    ('Insights on CFRM Awareness', ['cfrm_awareness', 'info', 'preferred_info']),
+    (None, ['complaint_choice']),
+    ('Likelihood of complaint submision', ['nonsens', 'sens_comp', 'concerns']),
+    (None, ['so', 'st']),
+    (None, ['flup']),
+    (None, ['st1', 'st2', 'st3', 'st4']),
+    (None, ['follow_up_aftercall']),
+    (None, ['complaint_res', 'cr_opinion']),
+    (None, ['com_nonsens', 'com_sens']),
+    (None, ['improve_cfrm', 'improve_overall', 'complaint_topic_now']),
+]
+
+
+def age_groups(age):
+    conditions = [
+        (age <= 17),
+        ((age > 17) & (age <= 59)),
+        (age > 59)
+    ]
+    return np.select(conditions, AGE_LABELS, default='Unknown')
+
+
+def normalize(df):
+    """Shorten answer labels and derive AgeGroup, in place; returns df."""
+    for column, labels in LABELS.items():
+        if column in df:
+            df[column] = df[column].replace(labels)
+    if AGE in df:
+        df[AGE_GROUP] = age_groups(df[AGE])
+    return df
+
+CHARTED = {question.column for question in QUESTIONS.values()}
+
+
+def is_free_text(column):
+    # Text columns that are neither charted nor filtered on: the "Other"
+    # elaborations and comments of the export
+    return column not in CHARTED and column not in FILTERS
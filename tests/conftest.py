@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from synthetic import make_survey  # noqa: E402
+
+
+@pytest.fixture
+def export():
+    """A raw synthetic export of a few hundred submissions."""
+    return make_survey(400)
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import cube_view
+from charts import build_figures
+from snapshot import SurveyStore
+from survey import normalize
+
+
+def frontend_copy(tmp_path):
+    # A source tree without plotly.js yet
+    frontend = tmp_path / 'cube_view'
+    shutil.copytree(cube_view.FRONTEND, frontend, ignore=shutil.ignore_patterns(cube_view.PLOTLY_JS))
+    return str(frontend)
+
+
+def test_plotly_is_copied_next_to_the_component(tmp_path, monkeypatch):
+    monkeypatch.setattr(cube_view, 'FRONTEND', frontend_copy(tmp_path))
+    assert cube_view._frontend() == cube_view.FRONTEND
+    plotly_js = os.path.join(cube_view.FRONTEND, cube_view.PLOTLY_JS)
+    assert os.stat(plotly_js).st_mode & 0o777 == 0o644
+
+
+def test_read_only_tree_is_served_from_a_copy(tmp_path, monkeypatch):
+    frontend = frontend_copy(tmp_path)
+    monkeypatch.setattr(cube_view, 'FRONTEND', frontend)
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path / 'tmp'))
+    os.makedirs(tempfile.tempdir)
+    mkstemp = tempfile.mkstemp
+
+    def read_only(dir=None, **kwargs):
+        if dir == frontend:
+            raise PermissionError(13, 'Read-only file system', dir)
+        return mkstemp(dir=dir, **kwargs)
+
+    monkeypatch.setattr(tempfile, 'mkstemp', read_only)
+    served = cube_view._frontend()
+    assert served.startswith(tempfile.tempdir)
+    assert sorted(os.listdir(served)) == sorted(os.listdir(frontend) + [cube_view.PLOTLY_JS])
+    assert not os.path.exists(os.path.join(frontend, cube_view.PLOTLY_JS))
+
+
+def test_weighted_payload_sends_the_submissions_too(export):
+    data = SurveyStore.from_frame(normalize(export))
+    weighted = data.weighted(np.full(len(data), 2.5))
+    payload = cube_view.payload('v1', weighted, build_figures(weighted, weighted.default_selection()))
+    assert sum(payload['rows']) == len(data)
+    assert sum(payload['estimates']) == 2.5 * len(data)
+    assert cube_view.payload('v1', data, build_figures(data, data.default_selection()))['estimates'] is None
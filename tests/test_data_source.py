@@ -0,0 +1,104 @@
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from data_source import DataSource
+from disk_cache import DiskCache
+from snapshot import build_store, is_current
+
+
+class ExportHandler(BaseHTTPRequestHandler):
+    """Serves the server's `body` with its validators, 304 when the request's match."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        etag = f'"{server.revision}"'
+        last_modified = formatdate(1700000000 + server.revision, usegmt=True)
+        if self.headers.get('If-None-Match') == etag or self.headers.get('If-Modified-Since') == last_modified:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Content-Length', str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_export(export):
+    """A local HTTP server in place of the survey export link."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ExportHandler)
+    server.body = export.to_csv(sep=';', index=False).encode()
+    server.revision = 1
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stored_source(tmp_path, export, schema='1'):
+    path = tmp_path / 'export.csv'
+    if not path.exists():
+        export.to_csv(path, sep=';', index=False)
+    store = DiskCache(str(tmp_path / 'cache.sqlite'))
+    return DataSource(str(path), interval=0, parse=build_store, store=store, schema=schema, validate=is_current)
+
+
+def test_restores_the_stored_snapshot(tmp_path, export):
+    first = stored_source(tmp_path, export).current()
+    source = stored_source(tmp_path, export)
+    assert source._restore()
+    assert source.current().version == first.version
+
+
+def test_store_pickled_by_older_code_is_loaded_afresh(tmp_path, export):
+    source = stored_source(tmp_path, export)
+    snapshot = source.current()
+    del snapshot.data.schema  # As pickled before the attribute existed
+    source._persist(snapshot)
+
+    source = stored_source(tmp_path, export)
+    assert not source._restore()
+    assert is_current(source.current().data)
+
+
+def test_snapshot_of_another_schema_is_not_read(tmp_path, export):
+    stored_source(tmp_path, export, schema='1').current()
+    assert not stored_source(tmp_path, export, schema='2')._restore()
+
+
+def test_remote_export_is_revalidated(http_export, export):
+    source = DataSource(f'http://127.0.0.1:{http_export.server_address[1]}/export.csv', interval=0,
+                        parse=build_store)
+    snapshot = source.current()
+    assert snapshot.etag == '"1"'
+    assert 'If-None-Match' not in http_export.requests[0]
+
+    # Not modified: the validators are sent and the snapshot is kept
+    assert not source.refresh()
+    assert http_export.requests[1]['If-None-Match'] == '"1"'
+    assert http_export.requests[1]['If-Modified-Since'] == snapshot.last_modified
+    assert source.current() is snapshot
+
+    # Same body under new validators: kept, with the new validators
+    http_export.revision = 2
+    assert not source.refresh()
+    assert source.current() is snapshot
+    assert snapshot.etag == '"2"'
+
+    # New body: a new snapshot
+    http_export.revision = 3
+    http_export.body = export.head(200).to_csv(sep=';', index=False).encode()
+    assert source.refresh()
+    assert source.current().version != snapshot.version
+    assert source.current().etag == '"3"'
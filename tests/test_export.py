@@ -0,0 +1,50 @@
+import io
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from export import export_aggregates, formats
+from snapshot import SurveyStore
+from survey import DISTRICT, QUESTIONS, normalize
+
+SUBMITTED = QUESTIONS['so'].column
+
+
+def store(export, blank=None):
+    """Store of `export`; the district `blank` left the 'so' question unanswered."""
+    if blank is not None:
+        export.loc[export[DISTRICT] == blank, SUBMITTED] = None
+    return SurveyStore.from_frame(normalize(export))
+
+
+def selections(data):
+    nothing = {name: [] for name in data.filters}
+    kyiv = {**data.default_selection(), DISTRICT: ['Kyiv']}
+    return {'empty selection': nothing, 'chart without answers': kyiv}
+
+
+@pytest.mark.parametrize('fmt', formats())
+@pytest.mark.parametrize('case', ['empty selection', 'chart without answers'])
+def test_aggregates_with_an_empty_chart_table(export, fmt, case):
+    data = store(export, blank='Kyiv')
+    body = export_aggregates(data, selections(data)[case], fmt)
+    if fmt == 'xlsx':
+        sheets = pd.read_excel(io.BytesIO(body), sheet_name=None)
+        assert list(sheets) == list(QUESTIONS)
+        assert sheets['so'].empty
+    elif fmt == 'parquet':
+        table = pq.read_table(io.BytesIO(body))
+        assert table.schema.field('count').type == 'int64'
+        assert (table.column('chart').to_pandas() == 'so').sum() == 0
+    else:
+        assert body.startswith(b'chart;question;answer;count')
+
+
+def test_parquet_aggregates_match_csv(export):
+    data = store(export)
+    selection = data.default_selection()
+    parquet = pq.read_table(io.BytesIO(export_aggregates(data, selection, 'parquet'))).to_pandas()
+    csv = pd.read_csv(io.BytesIO(export_aggregates(data, selection, 'csv')), sep=';', dtype={'answer': str})
+    assert parquet['count'].tolist() == csv['count'].tolist()
+    assert parquet['answer'].tolist() == csv['answer'].tolist()
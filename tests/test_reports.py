@@ -0,0 +1,17 @@
+import numpy as np
+
+import reports
+from snapshot import SurveyStore
+from survey import DISTRICT, normalize
+
+
+def test_weighted_reports_count_submissions_and_beneficiaries(tmp_path, export):
+    data = SurveyStore.from_frame(normalize(export))
+    weighted = data.weighted(np.full(len(data), 2.0))
+    written = reports.generate(weighted, str(tmp_path), [DISTRICT], 'v1', workers=0)
+    district = data.options(DISTRICT)[0]
+    submissions = int((normalize(export)[DISTRICT] == district).sum())
+    expected = f'{submissions:,} submissions, weighted to {2 * submissions:,} beneficiaries'
+    assert written[0][2] == expected
+    assert expected in (tmp_path / 'index.html').read_text()
+    assert expected in (tmp_path / f'{written[0][0]}.html').read_text()
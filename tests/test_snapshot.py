@@ -0,0 +1,17 @@
+import numpy as np
+
+from snapshot import SurveyStore
+from survey import QUESTIONS, normalize
+
+
+def test_answer_rows_of_a_numeric_column(export):
+    df = normalize(export)
+    column = QUESTIONS['usage'].column
+    df[column] = np.random.default_rng(0).choice([3, 2, 1], len(df))
+    data = SurveyStore.from_frame(df)
+    rows = data.rows(data.default_selection())
+    counts = data.count_rows('usage', rows)
+    for answer, value in enumerate(data.answers['usage']):
+        found = data.answer_rows('usage', answer, rows)
+        assert len(found) == counts.iloc[answer]
+        assert (data.columns[column][found] == value).all()
@@ -0,0 +1,14 @@
+from snapshot import SurveyStore
+from survey import DISTRICT, normalize
+from url_state import canonical, parse, state_hash
+
+
+def test_values_are_matched_regardless_of_case(export):
+    data = SurveyStore.from_frame(normalize(export))
+    district = data.options(DISTRICT)[0]
+    selection, _, compare, _ = parse(data, {'district': [district.lower()], 'compare': ['district'],
+                                            'segment': [district.upper(), district]})
+    assert selection[DISTRICT] == [district]
+    assert compare == (DISTRICT, [district])
+    exact, _, _, _ = parse(data, {'district': [district]})
+    assert state_hash(canonical(data, selection)) == state_hash(canonical(data, exact))
@@ -0,0 +1,29 @@
+import vocabulary
+from snapshot import SurveyStore
+from survey import QUESTIONS, normalize
+
+
+def report(export):
+    return vocabulary.check(SurveyStore.from_frame(normalize(export)))
+
+
+def test_declared_answers_are_not_reported(export):
+    assert not report(export)['rows'].any()
+
+
+def test_reworded_rating_is_reported(export):
+    column = QUESTIONS['st1'].column
+    rows = (export[column] == 'Very Good').sum()
+    export[column] = export[column].replace({'Very Good': 'Very good'})
+    found = report(export).set_index(['question', 'answer'])
+    assert found.loc[('st1', 'Very good'), 'issue'] == 'renamed'
+    assert found.loc[('st1', 'Very good'), 'rows'] == rows
+    assert found.loc[('st1', 'Very good'), 'suggestion'] == 'Very Good'
+
+
+def test_reworded_multiple_choice_option_is_reported(export):
+    column = QUESTIONS['info'].column
+    export[column] = export[column].str.replace('Word of mouth', 'Word-of-mouth', regex=False)
+    found = report(export).set_index(['question', 'answer'])
+    assert found.loc[('info', 'Word-of-mouth'), 'suggestion'] == 'Word of mouth'
+    assert found.loc[('info', 'Word of mouth'), 'issue'] == 'unused'
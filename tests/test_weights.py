@@ -0,0 +1,47 @@
+import logging
+
+import pytest
+
+import weights
+from snapshot import SurveyStore
+from survey import AGE_GROUP, normalize
+
+
+def write(tmp_path, text):
+    path = tmp_path / 'weights.csv'
+    path.write_text(text)
+    return str(path)
+
+
+def test_decimal_commas(tmp_path):
+    table = weights.load(write(tmp_path, 'district;gender;age_band;weight\nKyiv;Female;18-59 years;1,5\n'))
+    assert table['weight'].tolist() == [1.5]
+
+
+def test_values_that_are_not_numbers(tmp_path):
+    with pytest.raises(ValueError):
+        weights.load(write(tmp_path, 'district;gender;age_band;weight\nKyiv;Female;18-59 years;many\n'))
+
+
+def test_uncovered_interviews_are_logged(tmp_path, export, caplog):
+    data = SurveyStore.from_frame(normalize(export))
+    table = weights.load(write(tmp_path, 'district;gender;age_band;population\nKyiv;Female;18-59 years;1000\n'))
+    with caplog.at_level(logging.WARNING, logger='weights'):
+        row_weights = weights.row_weights(data, table)
+    covered = row_weights != 1  # The listed group has far fewer than 1000 interviews
+    assert f'{len(data) - covered.sum()} of {len(data)} interviews' in caplog.text
+    assert row_weights[covered].sum() == pytest.approx(1000)
+
+
+def test_headers_are_normalized_before_the_keys_are_read_as_text(tmp_path, export):
+    table = weights.load(write(tmp_path, 'District;Gender;Age_Band;Weight\n101;1;18-59 years;2\n'))
+    assert table['district'].tolist() == ['101'] and table['gender'].tolist() == ['1']
+    weights.row_weights(SurveyStore.from_frame(normalize(export)), table)
+
+
+def test_data_without_a_key_column(tmp_path, export):
+    data = SurveyStore.from_frame(normalize(export))
+    del data.categories[AGE_GROUP]  # e.g. a numeric AgeGroup column
+    table = weights.load(write(tmp_path, 'district;gender;age_band;weight\nKyiv;Female;18-59 years;2\n'))
+    with pytest.raises(ValueError):
+        weights.row_weights(data, table)
@@ -0,0 +1,63 @@
+"""Inverted index over the free text answers of the export.
+
+Every distinct answer text is tokenized once at load time. ``terms`` is the
+sorted vocabulary and ``postings[offsets[i]:offsets[i + 1]]`` the sorted row
+numbers whose text contains ``terms[i]``, so a query is a few binary searches
+and set intersections rather than a scan of every row.
+"""
+import re
+from collections import defaultdict
+
+import numpy as np
+
+TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text).casefold())
+
+
+class TextIndex:
+
+    def __init__(self, terms, offsets, postings):
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+
+    def __len__(self):
+        return len(self.terms)
+
+    @classmethod
+    def build(cls, columns, categories, names):
+        """Index the category coded text columns `names` of a SurveyStore."""
+        rows_by_term = defaultdict(list)
+        for name in names:
+            codes = columns[name]
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(categories[name]) + 1))
+            for code, text in enumerate(categories[name]):
+                rows = order[bounds[code]:bounds[code + 1]]
+                for term in set(tokenize(text)):
+                    rows_by_term[term].append(rows)
+        terms = sorted(rows_by_term)
+        parts = [np.unique(np.concatenate(rows_by_term[term])) for term in terms]
+        offsets = np.concatenate([[0], np.cumsum([len(part) for part in parts], dtype=np.int64)]).astype(np.int64)
+        postings = np.concatenate(parts).astype(np.int32) if parts else np.zeros(0, np.int32)
+        return cls(np.array(terms, dtype=str), offsets, postings)
+
+    def rows(self, term):
+        """Rows containing a word that starts with `term`."""
+        lo, hi = np.searchsorted(self.terms, [term, term + '\U0010ffff'])
+        if hi - lo == 1:
+            return np.asarray(self.postings[self.offsets[lo]:self.offsets[hi]])
+        return np.unique(self.postings[self.offsets[lo]:self.offsets[hi]])
+
+    def search(self, query):
+        """Sorted row numbers matching every word of `query` (as a prefix)."""
+        result = None
+        for term in dict.fromkeys(tokenize(query)):
+            rows = self.rows(term)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if not len(result):
+                break
+        return np.zeros(0, np.int32) if result is None else result
@@ -0,0 +1,99 @@
+"""The sidebar state as canonical URL query parameters.
+
+Each filter is one repeated parameter holding its selected values in option
+order; a filter with everything selected is left out, so the unfiltered page
+has a bare URL. The search is ``q``, normalized to its words. A comparison is
+``compare`` (the filter) and a repeated ``segment`` (its values, in the order
+chosen). Weighted estimates are ``weighted=1``. Two links that show the same
+view have the same parameters and the same `state_hash`.
+"""
+import hashlib
+import re
+from urllib.parse import urlencode
+
+from survey import DISTRICT, FILTERS, GENDER, USAGE
+from text_index import tokenize
+
+PARAMS = {GENDER: 'gender', USAGE: 'usage', DISTRICT: 'district'}
+QUERY = 'q'
+COMPARE = 'compare'
+SEGMENT = 'segment'
+WEIGHTED = 'weighted'
+BLANK = '(blank)'  # The missing value of a filter
+NONE = '-'  # A filter with nothing selected
+
+
+def param(name):
+    # Filters added later get a slug of their column name
+    return PARAMS.get(name) or re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+def _label(option):
+    return BLANK if option is None else str(option)
+
+
+def _lookup(options):
+    # Hand-edited links may change the case: ?district=kyiv is Kyiv
+    labels = {}
+    for option in options:
+        labels.setdefault(_label(option).casefold(), option)
+    return labels
+
+
+def canonical(data, selection, query='', compare=None, weighted=False):
+    """Query parameters of the view, as a {name: [values]} dict.
+
+    `compare` is (filter, segments) or None; `weighted` adds ``weighted=1``.
+    """
+    params = {}
+    for name, positions in zip(data.filters, data.selection_index(selection)):
+        options = data.filters[name]
+        if len(positions) == len(options):
+            continue
+        values = [_label(options[i]) for i in positions]
+        params[param(name)] = values or [NONE]
+    terms = tokenize(query)
+    if terms:
+        params[QUERY] = [' '.join(terms)]
+    if compare is not None:
+        name, segments = compare
+        params[COMPARE] = [param(name)]
+        params[SEGMENT] = [_label(segment) for segment in segments]
+    if weighted:
+        params[WEIGHTED] = ['1']
+    return params
+
+
+def parse(data, params):
+    """(selection, query, compare, weighted) from query parameters.
+
+    Values are matched regardless of case; unknown ones are dropped.
+    """
+    selection = {}
+    for name in FILTERS:
+        options = data.filters[name]
+        values = params.get(param(name))
+        if values is None:
+            selection[name] = list(options)
+            continue
+        labels = _lookup(options)
+        selected = [labels[value.casefold()] for value in values if value.casefold() in labels]
+        # A stale link naming no current value shows everything rather than nothing
+        selection[name] = selected if selected or values == [NONE] else list(options)
+    compare = None
+    names = {param(name): name for name in FILTERS}
+    if params.get(COMPARE, [None])[0] in names:
+        name = names[params[COMPARE][0]]
+        labels = _lookup(data.filters[name])
+        segments = [labels[value.casefold()] for value in params.get(SEGMENT, []) if value.casefold() in labels]
+        compare = (name, list(dict.fromkeys(segments)))
+    weighted = params.get(WEIGHTED, ['0'])[0] == '1'
+    return selection, ' '.join(params.get(QUERY, [])), compare, weighted
+
+
+def query_string(params):
+    return urlencode(sorted(params.items()), doseq=True)
+
+
+def state_hash(params):
+    return hashlib.sha1(query_string(params).encode('utf-8')).hexdigest()[:12]
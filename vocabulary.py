@@ -0,0 +1,100 @@
+"""Answer vocabulary drift: export answers the declared option lists miss.
+
+Multiple choice questions are counted by their option lists in survey.py,
+long single choice answers are shortened by the LABELS maps and some charts
+show a fixed list of answers (the ``order`` of charts.CHARTS, e.g. the rating
+scales); an answer whose wording changed in the form matches none of them and
+silently drops out of the charts. `check` compares every answer of these
+questions with what is declared and reports
+
+* ``unknown`` answers matching no declared option,
+* ``renamed`` ones, unknown but close to a declared option (the likely new
+  wording of it), and
+* ``unused`` declared options that no submission gave.
+
+The check tokenizes the distinct answer texts of each column (split on ``;``
+for multiple choice) and counts their rows with one bincount over the column
+codes, so its cost barely grows with the number of rows.
+"""
+import difflib
+
+import numpy as np
+import pandas as pd
+
+from charts import CHARTS
+from survey import AGE_GROUP, AGE_LABELS, LABELS, QUESTIONS
+
+COLUMNS = ['question', 'issue', 'answer', 'rows', 'suggestion']
+ISSUES = ['renamed', 'unknown', 'unused']  # Report order, the likeliest undercounts first
+# How alike an unknown answer and a declared one must be to call it renamed
+SIMILARITY = 0.75
+
+
+def declared(key):
+    """(answers as they appear after loading, {raw text: answer}) of question `key`; None when not declared."""
+    question = QUESTIONS[key]
+    if question.multi:
+        return [option.rstrip(';').strip() for option in question.options], {}
+    renames = LABELS.get(question.column, {})
+    if CHARTS[key].order is not None:
+        # The chart shows these answers only
+        return list(CHARTS[key].order), renames
+    if renames:
+        return list(dict.fromkeys(renames.values())), renames
+    if question.column == AGE_GROUP:
+        return list(AGE_LABELS), {}
+    return None
+
+
+def answer_rows(data, question):
+    """Rows giving each distinct answer (token of a multiple choice one) of a question."""
+    codes = data.columns[question.column]
+    rows = np.bincount(codes[codes >= 0], minlength=len(data.categories[question.column]))
+    values = pd.Series(data.categories[question.column], dtype='string')
+    if question.multi:
+        values = values.str.split(';').explode()
+    values = values.str.strip()
+    values = values[values.notna() & (values != '')]
+    # A token repeated within one answer counts its rows once
+    pairs = values.rename('answer').reset_index().drop_duplicates()
+    return pd.Series(rows[pairs['index'].to_numpy()], index=pairs['answer'].to_numpy()).groupby(level=0).sum()
+
+
+def check(data):
+    """Drift report of SurveyStore `data`: a DataFrame with COLUMNS, worst first."""
+    found = []
+    for key, question in QUESTIONS.items():
+        vocabulary = declared(key)
+        if vocabulary is None or question.column not in data.categories:
+            continue
+        answers, renames = vocabulary
+        counts = answer_rows(data, question)
+        known = set(answers)
+        # Raw texts of the LABELS maps are matched too: a reworded long answer
+        # is closest to its old wording, which points to its short label
+        targets = {answer: answer for answer in answers}
+        targets.update(renames)
+        for answer, rows in counts.items():
+            if answer in known:
+                continue
+            close = difflib.get_close_matches(answer, list(targets), n=1, cutoff=SIMILARITY)
+            if close:
+                found.append((key, 'renamed', answer, int(rows), targets[close[0]]))
+            else:
+                found.append((key, 'unknown', answer, int(rows), None))
+        for answer in answers:
+            if counts.get(answer, 0) == 0:
+                found.append((key, 'unused', answer, 0, None))
+    found.sort(key=lambda row: (ISSUES.index(row[1]), -row[3]))
+    return pd.DataFrame(found, columns=COLUMNS)
+
+
+def summary(report):
+    """One line per kind of issue, e.g. '2 renamed (14 rows), 1 unused'."""
+    parts = []
+    for issue in ISSUES:
+        found = report[report['issue'] == issue]
+        if len(found):
+            rows = found['rows'].sum()
+            parts.append(f'{len(found)} {issue}' + (f' ({rows} rows)' if rows else ''))
+    return ', '.join(parts)
@@ -0,0 +1,90 @@
+"""Survey weights: how many beneficiaries each interview stands for.
+
+The weights table is a local CSV (``,`` or ``;`` separated, numbers with a
+decimal point or a decimal comma) with one row per
+district, gender and age band (the AgeGroup labels of survey.py) and either
+
+* a ``weight`` column: the weight of every interview of that group, or
+* a ``population`` column: the beneficiaries of that group; the weight is then
+  the population over the interviews of the group (post-stratification).
+
+    district;gender;age_band;population
+    Kyiv;Female;18-59 years;12000
+
+Interviews of groups the table does not list keep a weight of 1; their number
+is logged as a warning, since next to population weights (often hundreds)
+they barely count.
+"""
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+
+from survey import AGE_GROUP, DISTRICT, GENDER
+
+logger = logging.getLogger(__name__)
+
+# Columns of the table -> columns of the export they match
+KEYS = {'district': DISTRICT, 'gender': GENDER, 'age_band': AGE_GROUP}
+
+
+def load(path):
+    """The weights table at `path`, validated."""
+    # Everything is read as text: the headers are only normalized afterwards,
+    # and group keys such as district codes must not turn into numbers
+    table = pd.read_csv(path, sep=None, engine='python', dtype=str)
+    table.columns = [column.strip().lower() for column in table.columns]
+    missing = [name for name in KEYS if name not in table.columns]
+    if missing or not ({'weight', 'population'} & set(table.columns)):
+        raise ValueError(f'{path}: needs the columns {", ".join(KEYS)} and weight or population')
+    value = 'weight' if 'weight' in table.columns else 'population'
+    # Decimal commas, as in ;-separated exports
+    table[value] = pd.to_numeric(table[value].str.strip().str.replace(',', '.', regex=False), errors='coerce')
+    if table[value].isna().any() or (table[value] < 0).any():
+        raise ValueError(f'{path}: {value} must be a non-negative number on every row')
+    if table.duplicated(list(KEYS)).any():
+        raise ValueError(f'{path}: a group is listed twice')
+    return table
+
+
+def fingerprint(table):
+    """Short hash of the table, to tell weighted data versions apart."""
+    return hashlib.sha1(table.to_csv(index=False).encode('utf-8')).hexdigest()[:8]
+
+
+def row_weights(data, table):
+    """The weight of every row of SurveyStore `data`, as float64.
+
+    Each group's value is placed in a lookup array indexed by the category
+    codes of the three columns, which is then indexed by the codes of all rows
+    at once. Raises ValueError when `data` has no text column to match one of
+    the keys with.
+    """
+    missing = [column for column in KEYS.values() if column not in data.categories]
+    if missing:
+        raise ValueError(f'The data has no {", ".join(missing)} answers to weight by')
+    codes, sizes, positions = [], [], []
+    for name, column in KEYS.items():
+        categories = data.categories[column]
+        # Missing values (-1) take the extra last slot, which no group matches
+        codes.append(np.where(data.columns[column] < 0, len(categories), data.columns[column]))
+        sizes.append(len(categories) + 1)
+        positions.append(pd.Index([str(value) for value in categories]).get_indexer(table[name].str.strip()))
+    known = np.all([p >= 0 for p in positions], axis=0)
+    if not known.all():
+        logger.warning('Weights: %d groups match no interviews and are ignored', (~known).sum())
+    groups = np.ravel_multi_index([p[known] for p in positions], sizes)
+    rows = np.ravel_multi_index(codes, sizes)
+    uncovered = len(rows) - np.isin(rows, groups).sum()
+    if uncovered:
+        logger.warning('Weights: %d of %d interviews are in groups the table does not list and keep a weight of 1',
+                       uncovered, len(rows))
+    lookup = np.ones(int(np.prod(sizes)))
+    if 'weight' in table.columns:
+        lookup[groups] = table['weight'].to_numpy(np.float64)[known]
+    else:
+        interviews = np.bincount(rows, minlength=lookup.size)[groups]
+        population = table['population'].to_numpy(np.float64)[known]
+        lookup[groups] = np.divide(population, interviews, out=np.zeros_like(population), where=interviews > 0)
+    return lookup[rows]